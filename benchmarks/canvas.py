@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Frame time of drawing ad-hoc rectangles with separate
+:class:`gl2dl.primitives.Rect` draws compared to immediate-mode
+:class:`gl2dl.canvas.Canvas` which batches them into single draw call.
+"""
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.canvas import Canvas
+from gl2dl.primitives import Rect
+
+from context import hidden_window, report, timeit
+
+FRAMES = 20
+
+
+def rect_draws(rect, rects, colors):
+    for (x, y, _, __), color in zip(rects.tolist(), colors.tolist()):
+        rect.draw(x, y, color)
+
+    gl.glFinish()
+
+
+def canvas_calls(canvas, rects, colors):
+    for (x, y, width, height), color in zip(rects.tolist(), colors.tolist()):
+        canvas.rect(x, y, width, height, color)
+
+    canvas.flush()
+    gl.glFinish()
+
+
+def canvas_vectorized(canvas, rects, colors):
+    canvas.rects(rects, colors)
+
+    canvas.flush()
+    gl.glFinish()
+
+
+def run():
+    random = np.random.default_rng(0)
+    rect = Rect(2, 2)
+    canvas = Canvas()
+
+    for count in (1000, 10000):
+        rects = np.empty((count, 4), dtype=np.float32)
+        rects[:, :2] = random.uniform(0, 512, (count, 2))
+        rects[:, 2:] = 2
+        colors = random.uniform(0, 1, (count, 4))
+
+        for label, draw, drawable in (
+            ("Rect.draw() per rect", rect_draws, rect),
+            ("canvas.rect() per rect", canvas_calls, canvas),
+            ("canvas.rects()", canvas_vectorized, canvas),
+        ):
+            report("{} rects, {}".format(count, label), timeit(
+                lambda: draw(drawable, rects, colors), FRAMES
+            ))
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Offscreen GL context shared by benchmark scripts.
+
+Benchmarks do not need anything to be displayed so they use hidden GLFW
+window with the same context hints as :class:`gl2dl.app.GlfwApp`. Run them
+with ``LIBGL_ALWAYS_SOFTWARE=1`` to measure Mesa's software renderer.
+"""
+from contextlib import contextmanager
+from time import perf_counter
+
+import glfw
+
+from gl2dl import compat
+from gl2dl.app import window
+from gl2dl.uniforms import frame_uniforms
+
+
+class HiddenWindowContext(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+
+@contextmanager
+def hidden_window(width=512, height=512):
+    compat.enable_glfw_errors_propagation()
+
+    if not glfw.init():
+        raise RuntimeError("Could not initialize OpenGL context")
+
+    glfw.window_hint(glfw.VISIBLE, False)
+    glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
+    glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 2)
+    glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, 1)
+    glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+
+    context_window = glfw.create_window(width, height, 'benchmark', None, None)
+    glfw.make_context_current(context_window)
+    window.attach_context(HiddenWindowContext(width, height))
+    frame_uniforms.update(width, height)
+
+    try:
+        yield context_window
+    finally:
+        glfw.terminate()
+
+
+def timeit(function, number):
+    """ Return average time of single ``function`` call in seconds """
+    start = perf_counter()
+    for _ in range(number):
+        function()
+
+    return (perf_counter() - start) / number
+
+
+def report(label, seconds):
+    print("{:<52} {:>10.3f} us".format(label, seconds * 1e6))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Resident memory of process holding many textures.
+
+Loads every example asset many times as separate textures and reports
+growth of resident set size with and without keeping PIL images of
+uploaded textures. Every mode runs in fresh process. Note that with
+Mesa's software renderer texture storage itself also lives in system
+memory.
+"""
+import glob
+import os
+import resource
+import subprocess
+import sys
+
+from gl2dl.textures import Texture
+
+from context import hidden_window
+
+COPIES = 20
+ASSETS = os.path.join(os.path.dirname(__file__), '..', 'examples', 'assets')
+
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # note: peak instead of current RSS on systems without procfs
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run(keep_image):
+    keep_image = keep_image == 'keep'
+    files = sorted(glob.glob(os.path.join(ASSETS, '*.png')))
+
+    before = resident_bytes()
+    loaded = [
+        Texture(file_name, keep_image=keep_image)
+        for _ in range(COPIES)
+        for file_name in files
+    ]
+    grown = resident_bytes() - before
+
+    print("{:<52} {:>10.1f} MiB ({:.1f} MiB of texels)".format(
+        "{} textures, {} image".format(
+            len(loaded), "keeping" if keep_image else "releasing"
+        ),
+        grown / 2. ** 20,
+        sum(texture.nbytes for texture in loaded) / 2. ** 20,
+    ))
+
+
+def main():
+    for mode in ('keep', 'release'):
+        subprocess.check_call([sys.executable, __file__, mode])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with hidden_window():
+            run(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Frame time of :class:`gl2dl.primitives.RectBatch` when small fraction of
+rectangles moves every frame.
+
+"all moved" rows show the cost of rebuilding and uploading whole batch
+which is what every draw used to do. Same is measured for
+:class:`gl2dl.primitives.InstancedRectBatch`.
+"""
+from itertools import product
+
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.primitives import InstancedRectBatch, RectBatch
+
+from context import hidden_window, report, timeit
+
+FRAMES = 50
+
+
+def frame(batch, handles, moving, random):
+    moved = random.choice(handles, moving, replace=False)
+    batch.move_many(moved, random.uniform(0, 512, (moving, 2)))
+
+    batch.draw()
+    gl.glFinish()
+
+
+def run():
+    random = np.random.default_rng(0)
+
+    for batch_class, count in product(
+        (RectBatch, InstancedRectBatch), (10000, 100000)
+    ):
+        batch = batch_class()
+        handles = batch.add_many(random.uniform(0, 512, (count, 2)), (2, 2))
+        batch.draw()
+
+        for fraction in (.01, 1.):
+            report(
+                "{} {} rects, {} moved".format(
+                    batch_class.__name__, count,
+                    "{:.0%}".format(fraction) if fraction < 1 else "all",
+                ),
+                timeit(
+                    lambda: frame(
+                        batch, handles, int(count * fraction), random
+                    ),
+                    FRAMES
+                )
+            )
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
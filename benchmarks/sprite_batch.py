@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Frame time of drawing many animated sprites with separate
+:meth:`gl2dl.sprites.AnimatedSprite.draw` calls compared to
+:class:`gl2dl.sprites.SpriteBatch` that draws them with single instanced
+draw call and retained :class:`gl2dl.sprites.AnimationBatch` that selects
+frames on GPU.
+"""
+import os
+
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.sprites import AnimatedSprite, AnimationBatch, SpriteBatch
+from gl2dl.uniforms import frame_uniforms
+
+from context import hidden_window, report, timeit
+
+FRAMES = 20
+ASSETS = os.path.join(os.path.dirname(__file__), '..', 'examples', 'assets')
+
+
+def sprite_draws(sprite, positions, frames):
+    for (x, y), frame in zip(positions.tolist(), frames.tolist()):
+        sprite.draw(x, y, frame=frame)
+
+    gl.glFinish()
+
+
+def batch_adds(batch, sprite, positions, frames):
+    for (x, y), frame in zip(positions.tolist(), frames.tolist()):
+        batch.add(sprite, x, y, frame=frame)
+
+    batch.draw()
+    gl.glFinish()
+
+
+def batch_add_many(batch, sprite, positions, frames):
+    batch.add_many(sprite, positions, frames=frames)
+
+    batch.draw()
+    gl.glFinish()
+
+
+def animation_batch(batch):
+    # note: new frame time like apps upload on every frame
+    frame_uniforms.update(frame_uniforms.width, frame_uniforms.height)
+    batch.draw()
+    gl.glFinish()
+
+
+def run():
+    random = np.random.default_rng(0)
+    sprite = AnimatedSprite(
+        (16, 16), os.path.join(ASSETS, 'numbers.png'), pivot=(8, 8)
+    )
+    batch = SpriteBatch()
+
+    for count in (1000, 10000):
+        positions = random.uniform(0, 512, (count, 2))
+        frames = random.integers(0, 10, count)
+
+        report("{} sprites, AnimatedSprite.draw()".format(count), timeit(
+            lambda: sprite_draws(sprite, positions, frames), FRAMES
+        ))
+        report("{} sprites, SpriteBatch.add()".format(count), timeit(
+            lambda: batch_adds(batch, sprite, positions, frames), FRAMES
+        ))
+        report("{} sprites, SpriteBatch.add_many()".format(count), timeit(
+            lambda: batch_add_many(batch, sprite, positions, frames), FRAMES
+        ))
+
+        animations = AnimationBatch(sprite)
+        animations.add_many(positions, starts=-frames / 10.)
+        report("{} sprites, AnimationBatch.draw()".format(count), timeit(
+            lambda: animation_batch(animations), FRAMES
+        ))
+        animations.delete()
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Startup cost of building all built-in shader programs.
+
+Compares compiling from sources with cold (empty) and warm on-disk program
+binary cache. Every measurement runs in fresh process with its own empty
+Mesa shader cache directory so only gl2dl cache is measured. Use Mesa's
+software renderer with:
+
+    LIBGL_ALWAYS_SOFTWARE=1 python startup.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from gl2dl.lights import GLight, ShadowMap
+from gl2dl.primitives import Rect, Triangles
+from gl2dl.shaders import ProgramBinaryCache, ShaderProgram
+from gl2dl.sprites import AnimatedSprite, Sprite
+
+from context import hidden_window, report
+
+SOURCES = [
+    (Sprite.vertex_code, Sprite.fragment_code),
+    (AnimatedSprite.vertex_code, AnimatedSprite.fragment_code),
+    (Rect.vertex_code, Rect.fragment_code),
+    (Triangles.vertex_code, Triangles.fragment_code),
+    (GLight.vertex_code, GLight.fragment_code),
+    (ShadowMap.vertex_code, ShadowMap.fragment_code, ShadowMap.geometry_code),
+]
+
+
+def build_all(binary_cache=None):
+    start = perf_counter()
+    built = [
+        ShaderProgram(*sources, binary_cache=binary_cache)
+        for sources in SOURCES
+    ]
+    elapsed = perf_counter() - start
+
+    for program in built:
+        program.delete()
+
+    return elapsed
+
+
+def run(mode, directory):
+    binary_cache = ProgramBinaryCache(directory)
+
+    if mode != 'none' and not binary_cache.is_supported():
+        print("program binaries are not supported by this driver")
+
+    report("{} cache".format(mode), build_all(
+        binary_cache if mode != 'none' else None
+    ))
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='gl2dl-programs-')
+
+    for mode in ('none', 'cold', 'warm'):
+        environment = dict(
+            os.environ,
+            MESA_SHADER_CACHE_DIR=tempfile.mkdtemp(prefix='mesa-'),
+        )
+        subprocess.check_call(
+            [sys.executable, __file__, mode, directory], env=environment,
+        )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with hidden_window():
+            run(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Frame time of drawing sprites with many different equally sized images
+with :class:`gl2dl.sprites.SpriteBatch` (one draw call per texture)
+compared to :class:`gl2dl.sprites.TextureArrayBatch` with images stored
+as layers of single texture array (one draw call).
+"""
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.sprites import Sprite, SpriteBatch, TextureArrayBatch
+from gl2dl.textures import Texture, TextureArray
+
+from context import hidden_window, report, timeit
+
+FRAMES = 20
+IMAGES = 64
+SIZE = 16
+
+
+def sprite_batch(batch, sprites, positions, images):
+    for image in range(IMAGES):
+        batch.add_many(sprites[image], positions[images == image])
+
+    batch.draw()
+    gl.glFinish()
+
+
+def texture_array_batch(batch, positions, images):
+    batch.add_many(images, positions)
+
+    batch.draw()
+    gl.glFinish()
+
+
+def run():
+    random = np.random.default_rng(0)
+    pixels = random.integers(
+        0, 256, (IMAGES, SIZE, SIZE, 4), dtype=np.uint8
+    )
+
+    sprites = [Sprite(texture=Texture(image)) for image in pixels]
+    sprites_batch = SpriteBatch()
+    array_batch = TextureArrayBatch(TextureArray(pixels))
+
+    for count in (1000, 10000):
+        positions = random.uniform(0, 512, (count, 2))
+        images = random.integers(0, IMAGES, count)
+
+        report("{} sprites, {} textures, SpriteBatch".format(
+            count, IMAGES
+        ), timeit(
+            lambda: sprite_batch(sprites_batch, sprites, positions, images),
+            FRAMES
+        ))
+        report("{} sprites, {} layers, TextureArrayBatch".format(
+            count, IMAGES
+        ), timeit(
+            lambda: texture_array_batch(array_batch, positions, images),
+            FRAMES
+        ))
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
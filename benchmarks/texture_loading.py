@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Longest frame while streaming textures in with synchronous
+:meth:`gl2dl.textures.TextureCache.acquire` compared to asynchronous
+:class:`gl2dl.textures.TextureLoader` decoding on worker threads and
+uploading within per-frame budget.
+"""
+import os
+import tempfile
+from time import perf_counter, sleep
+
+import OpenGL.GL as gl
+import numpy as np
+from PIL import Image
+
+from gl2dl.textures import loader, textures
+
+from context import hidden_window, report
+
+TEXTURES = 16
+SIZE = 1024
+FRAME = 1. / 60
+
+
+def write_images(directory):
+    random = np.random.default_rng(0)
+    file_names = []
+
+    for index in range(TEXTURES):
+        file_name = os.path.join(directory, "{}.png".format(index))
+        pixels = random.integers(0, 256, (SIZE, SIZE, 4), dtype=np.uint8)
+        Image.fromarray(pixels).save(file_name)
+        file_names.append(file_name)
+
+    return file_names
+
+
+def synchronous(file_names):
+    """ Return longest frame, all textures are loaded in the first one """
+    start = perf_counter()
+    loaded = [textures.acquire(file_name) for file_name in file_names]
+    gl.glFinish()
+    longest = perf_counter() - start
+
+    for texture in loaded:
+        textures.release(texture)
+    textures.clear()
+
+    return longest
+
+
+def asynchronous(file_names):
+    """ Return longest frame and number of frames until all are uploaded """
+    start = perf_counter()
+    loaded = [
+        textures.acquire(file_name, asynchronous=True)
+        for file_name in file_names
+    ]
+    gl.glFinish()
+    longest = perf_counter() - start
+    frames = 1
+
+    while len(loader):
+        # note: rest of the frame, workers keep decoding meanwhile
+        sleep(FRAME)
+        start = perf_counter()
+        loader.update()
+        gl.glFinish()
+        longest = max(longest, perf_counter() - start)
+        frames += 1
+
+    for texture in loaded:
+        textures.release(texture)
+    textures.clear()
+
+    return longest, frames
+
+
+def run():
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = write_images(directory)
+
+        report("{} textures {}x{}, synchronous".format(
+            TEXTURES, SIZE, SIZE
+        ), synchronous(file_names))
+
+        for budget in (None, SIZE * SIZE * 4):
+            loader.byte_budget = budget
+
+            longest, frames = asynchronous(file_names)
+            report("{} textures, async, byte budget {} ({} frames)".format(
+                TEXTURES, budget, frames
+            ), longest)
+
+        loader.shutdown()
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Time of replacing pixels of dynamic texture (e.g. fog-of-war layer) from
+numpy array on every frame by creating new :class:`gl2dl.textures.Texture`
+compared to :meth:`gl2dl.textures.Texture.update` in place and through
+pool of pixel buffer objects.
+"""
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.textures import Texture
+
+from context import hidden_window, report, timeit
+
+FRAMES = 50
+
+
+def new_texture(pixels, textures):
+    textures[0].delete()
+    textures[0] = Texture(pixels)
+    gl.glFlush()
+
+
+def update(pixels, textures, asynchronous):
+    textures[0].update(pixels, asynchronous=asynchronous)
+    gl.glFlush()
+
+
+def run():
+    random = np.random.default_rng(0)
+
+    for size in (256, 1024):
+        pixels = random.integers(0, 256, (size, size, 4), dtype=np.uint8)
+        textures = [Texture(pixels)]
+
+        report("{0}x{0}, new Texture()".format(size), timeit(
+            lambda: new_texture(pixels, textures), FRAMES
+        ))
+        report("{0}x{0}, Texture.update()".format(size), timeit(
+            lambda: update(pixels, textures, False), FRAMES
+        ))
+        report("{0}x{0}, Texture.update(asynchronous=True)".format(
+            size
+        ), timeit(lambda: update(pixels, textures, True), FRAMES))
+
+        textures[0].delete()
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
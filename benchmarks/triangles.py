@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Frame time of :class:`gl2dl.primitives.Triangles` when whole mesh is
+regenerated every frame.
+
+"reallocating" rows repeat what ``data`` setter used to do: two copies of
+the array and ``glBufferData`` with ``GL_STATIC_DRAW`` on every frame.
+Other rows use in-place storage, orphaning and three-segment ring buffer.
+"""
+import OpenGL.GL as gl
+import numpy as np
+
+from gl2dl.primitives import Triangles
+
+from context import hidden_window, report, timeit
+
+FRAMES = 100
+DTYPE = np.dtype([("position", np.float32, 2), ("color", np.float32, 4)])
+
+
+def reallocating(triangles, data):
+    data = np.copy(data)
+    if len(np.copy(data)):
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, triangles.vbo)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, data, gl.GL_STATIC_DRAW)  # noqa
+    triangles._data = data
+
+
+def frame(triangles, meshes, upload):
+    upload(triangles, next(meshes))
+
+    triangles.draw()
+    gl.glFinish()
+
+
+def run():
+    random = np.random.default_rng(0)
+
+    for count in (1000, 100000):
+        meshes = []
+        for _ in range(4):
+            mesh = np.zeros(count * 3, dtype=DTYPE)
+            # note: small triangles so rasterization does not dominate
+            mesh['position'] = np.repeat(
+                random.uniform(0, 512, (count, 2)), 3, axis=0
+            ) + random.uniform(0, 2, (count * 3, 2))
+            mesh['color'] = random.uniform(0, 1, (count * 3, 4))
+            meshes.append(mesh)
+
+        for label, kwargs, upload in (
+            ("reallocating", {}, reallocating),
+            ("static", {}, Triangles.data.fset),
+            ("streaming orphaned", {'streaming': True}, Triangles.data.fset),
+            (
+                "streaming 3-segment ring",
+                {'streaming': True, 'segments': 3},
+                Triangles.data.fset,
+            ),
+        ):
+            triangles = Triangles(meshes[0], **kwargs)
+            cycled = iter(meshes * FRAMES)
+
+            report(
+                "Triangles {} triangles, {}".format(count, label),
+                timeit(lambda: frame(triangles, cycled, upload), FRAMES)
+            )
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Per-uniform write cost of :class:`gl2dl.shaders.ShaderProgram`.
+
+Compares lookup-on-every-write approach (what ``program[key] = value`` used
+to do) with cached :class:`gl2dl.shaders.Uniform` handles. Handles mirror
+last written value so writes are measured both with alternating values
+(every write reaches the driver) and with the same value (no GL call).
+
+Also compares building projection matrix for every draw with
+:class:`gl2dl.camera.Camera` matrices cached in frame uniform buffer.
+"""
+from itertools import cycle
+
+import OpenGL.GL as gl
+
+from gl2dl.app import window
+from gl2dl.camera import Camera
+from gl2dl.primitives import ortho
+from gl2dl.shaders import ShaderProgram
+from gl2dl.sprites import Sprite
+from gl2dl.uniforms import frame_uniforms
+
+from context import hidden_window, report, timeit
+
+NUMBER = 20000
+
+
+def uncached_write(program, key, value):
+    # this is how every write looked before handles were resolved at link
+    # time: encode, look up type, query location, pick setter
+    name = key.encode('utf-8')
+    location = gl.glGetUniformLocation(program.handle, name)
+    size, gl_type = program.uniform(key).size, program.uniform(key).gl_type
+    setter, _, __ = ShaderProgram.TYPE_CONST_TO_SET_GET_TYPE[gl_type]
+    setter(location, size, value)
+
+
+def run():
+    program = ShaderProgram(Sprite.vertex_code, Sprite.fragment_code)
+    program.bind()
+
+    for key, values in (
+        ('scale', [(1., 1.), (2., 2.)]),
+        ('translation', [(0., 0.), (10., 10.)]),
+    ):
+        handle = program.uniform(key)
+        changing = cycle(values).__next__
+
+        report("{} uncached lookup".format(key), timeit(
+            lambda: uncached_write(program, key, changing()), NUMBER
+        ))
+        report("{} program[key] = value".format(key), timeit(
+            lambda: program.__setitem__(key, changing()), NUMBER
+        ))
+        report("{} handle.set(value)".format(key), timeit(
+            lambda: handle.set(changing()), NUMBER
+        ))
+        report("{} handle.set(same value)".format(key), timeit(
+            lambda: handle.set(values[0]), NUMBER
+        ))
+        report("{} handle.get()".format(key), timeit(
+            handle.get, NUMBER
+        ))
+
+    camera = Camera()
+    positions = cycle([(0, 0), (10, 10)]).__next__
+
+    def move_camera():
+        camera.position = positions()
+        frame_uniforms.use(camera)
+
+    report("ortho() per draw", timeit(
+        lambda: ortho(window.width, window.height, 10, 10), NUMBER
+    ))
+    report("frame_uniforms.use(camera) unchanged", timeit(
+        lambda: frame_uniforms.use(camera), NUMBER
+    ))
+    report("frame_uniforms.use(camera) moved", timeit(
+        move_camera, NUMBER
+    ))
+
+
+if __name__ == '__main__':
+    with hidden_window():
+        run()
@@ -26,7 +26,7 @@ class App(GlfwApp):
                 ([40, 40],   [.1, 0.5, .1, .5]),
                 ([40, 20],   [.1, 0,    1, .5]),
             ],
-            dtype=[("position", np.float32, 2), ("color", np.float32, 4)]
+            dtype=Triangles.FORMAT.dtype
         )
         self.triangles = Triangles(data)
 
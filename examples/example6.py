@@ -6,7 +6,7 @@ import numpy as np
 
 from gl2dl.app import GlfwApp
 from gl2dl.lights import GLight
-from gl2dl.primitives import rect_triangles, Rect
+from gl2dl.primitives import rects_triangles, Rect
 from gl2dl.app import window
 
 
@@ -17,14 +17,11 @@ class App(GlfwApp):
     def init(self, size, positions):
         self.rect = Rect(*size)
 
-        occluders = np.array([], dtype=np.float32)
+        rects = np.zeros((len(positions), 4))
+        rects[:, :2] = positions
+        rects[:, 2:] = size
 
-        for pos in positions:
-            occluders = np.append(occluders, rect_triangles(
-                pos[0], pos[1],
-                pos[0] + self.rect.width, pos[1] + self.rect.height
-                )
-            )
+        occluders = rects_triangles(rects)
 
         self.light = GLight((1, .5, .5), (0, 0,), occluders)
 
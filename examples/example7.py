@@ -4,7 +4,7 @@ from math import cos, sin, sqrt
 
 from gl2dl.app import GlfwApp
 from gl2dl.lights import GLight, ShadowMap
-from gl2dl.primitives import BaseRect, RectBatch
+from gl2dl.primitives import RectBatch
 from gl2dl.app import window
 
 
@@ -15,8 +15,7 @@ class App(GlfwApp):
     def init(self, size, positions):
         self.rect_batch = RectBatch()
 
-        for pos in positions:
-            self.rect_batch.append([pos, BaseRect(*size)])
+        self.rect_batch.add_many(positions, size)
         occluders = self.rect_batch.get_triangles()
 
         self.light = GLight((1, 0, 0), (1, 1,), occluders, radius=200)
@@ -29,14 +28,15 @@ class App(GlfwApp):
         self.light.position = x, y
 
     def display(self):
-        for seed, row in enumerate(self.rect_batch):
+        for seed, (handle, pos) in enumerate(zip(
+            self.rect_batch.handles, self.rect_batch.positions
+        )):
             r = random.Random(seed)
 
-            pos = row[0]
-            row[0] = (
+            self.rect_batch.move(handle, (
                 pos[0] + sin(time() * 10 * r.random()),
                 pos[1] + cos(time() * 10 * r.random()),
-            )
+            ))
 
         self.light._shadows = ShadowMap(self.rect_batch.get_triangles())
         self.light._shadows.position = self.light.position
@@ -9,7 +9,7 @@ from typing import List
 import glfw
 from gl2dl.app import GlfwApp
 from gl2dl.lights import GLight
-from gl2dl.primitives import BaseRect, RectBatch
+from gl2dl.primitives import RectBatch
 from gl2dl import blending
 from gl2dl.framebuffers import FrameBuffer, FrameBufferTexture
 from gl2dl.app import window
@@ -29,8 +29,7 @@ class App(GlfwApp):
     def init(self, size, positions):
         self.rect_batch = RectBatch()
 
-        for pos in positions:
-            self.rect_batch.append([pos, BaseRect(*size)])
+        self.rect_batch.add_many(positions, size)
 
         occluders = self.rect_batch.get_triangles()
 
@@ -13,7 +13,11 @@ try:
 except ImportError:
     imgui = None
 
-from . import compat
+from . import blending, compat
+from .canvas import canvas
+from .state import gl_state
+from .textures import loader
+from .uniforms import frame_uniforms
 
 
 class WindowState(object):
@@ -26,9 +30,15 @@ class WindowState(object):
     todo: make it immutable or semi-immutable
     todo: try to find a way to prevent this module level object from
           any change (maybe some import hook magic)
+
+    Window metrics are queried from attached context only once and then
+    cached because for most toolkits every query is a FFI call. Apps keep
+    them up to date with :meth:`resize` from their resize callbacks.
     """
     def __init__(self):
         self._attached_context = None
+        self._size = None
+        self._framebuffer_scale = None
 
     def attach_context(self, context):
         if self._attached_context:
@@ -37,13 +47,38 @@ class WindowState(object):
             )
         self._attached_context = context
 
+    def resize(self, width=None, height=None, framebuffer_scale=None):
+        """ Update cached window metrics
+
+        Any of metrics left as None will be queried from attached context
+        on next access.
+        """
+        self._size = (width, height) if width is not None else None
+        self._framebuffer_scale = framebuffer_scale
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = (
+                self._attached_context.width, self._attached_context.height
+            )
+        return self._size
+
     @property
     def width(self):
-        return self._attached_context.width
+        return self.size[0]
 
     @property
     def height(self):
-        return self._attached_context.height
+        return self.size[1]
+
+    @property
+    def framebuffer_scale(self):
+        if self._framebuffer_scale is None:
+            self._framebuffer_scale = getattr(
+                self._attached_context, 'framebuffer_scale', 1.
+            )
+        return self._framebuffer_scale
 
 
 window = WindowState()
@@ -57,6 +92,9 @@ class InitializationError(RuntimeError):
 class BaseApp(object):
     ENABLE_DEFAULT_KEYBOARD_HOOKS = True
 
+    # note: frame camera, drawables use it unless they get their own
+    camera = None
+
     def __init__(self, **kwargs):
         self.init(**kwargs)
 
@@ -153,13 +191,17 @@ class GlutApp(BaseApp):
 
     def _display(self):
         try:
+            frame_uniforms.update(
+                window.width, window.height, camera=self.camera
+            )
+            # note: textures decoded in background since last frame
+            loader.update()
             self.display()
+            canvas.flush()
         finally:
-            gl.glBindVertexArray(0)
-            gl.glUseProgram(0)
-
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+            # note: program, VAO and buffer bindings are left as they are
+            #       because all gl2dl binds go through gl_state anyway
+            gl_state.bind_framebuffer(0)
 
             glut.glutSwapBuffers()
 
@@ -167,7 +209,8 @@ class GlutApp(BaseApp):
         """User defined display handler stub"""
 
     def _resize_callback(self, width, height):
-        gl.glViewport(0, 0, width, height)
+        window.resize(width, height)
+        gl_state.viewport(0, 0, width, height)
         self.on_resize(width, height)
 
     def on_resize(self, width, height):
@@ -205,6 +248,14 @@ class GlfwApp(BaseApp):
         def height(self):
             return glfw.get_window_size(self.context_window)[1]
 
+        @property
+        def framebuffer_scale(self):
+            width, _ = glfw.get_window_size(self.context_window)
+            framebuffer_width, _ = glfw.get_framebuffer_size(
+                self.context_window
+            )
+            return float(framebuffer_width) / max(width, 1)
+
     def __init__(
         self,
         width=512,
@@ -240,6 +291,9 @@ class GlfwApp(BaseApp):
         glfw.set_key_callback(self.window, self._keyboard_callback)
         glfw.set_cursor_pos_callback(self.window, self._mouse_callback)
         glfw.set_window_size_callback(self.window, self._resize_callback)
+        glfw.set_framebuffer_size_callback(
+            self.window, self._framebuffer_resize_callback
+        )
         super(GlfwApp, self).__init__(**kwargs)
 
     def loop(self):
@@ -252,16 +306,24 @@ class GlfwApp(BaseApp):
 
     def _display(self):
         try:
+            self._update_frame_uniforms()
+            # note: textures decoded in background since last frame
+            loader.update()
             self.display()
+            canvas.flush()
         finally:
-            gl.glBindVertexArray(0)
-            gl.glUseProgram(0)
-
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+            # note: program, VAO and buffer bindings are left as they are
+            #       because all gl2dl binds go through gl_state anyway
+            gl_state.bind_framebuffer(0)
 
             glfw.swap_buffers(self.window)
 
+    def _update_frame_uniforms(self):
+        frame_uniforms.update(
+            window.width, window.height, window.framebuffer_scale,
+            camera=self.camera,
+        )
+
     def display(self):
         """User defined diplay handler stub"""
 
@@ -278,10 +340,17 @@ class GlfwApp(BaseApp):
         self.on_mouse_move(x, y)
 
     @compat.propagates
-    def _resize_callback(self, window, width, height):
-        gl.glViewport(0, 0, width, height)
+    def _resize_callback(self, context_window, width, height):
+        # note: framebuffer scale is recalculated on next access
+        window.resize(width, height)
+        gl_state.viewport(0, 0, width, height)
         self.on_resize(width, height)
 
+    @compat.propagates
+    def _framebuffer_resize_callback(self, context_window, width, height):
+        # note: keep window size but drop cached framebuffer scale
+        window.resize(*window.size)
+
 
 class ImguiApp(GlfwApp):
     def __init__(self, *args,  **kwargs):
@@ -294,18 +363,23 @@ class ImguiApp(GlfwApp):
 
     def _display(self):
         try:
+            self._update_frame_uniforms()
             self.renderer.process_inputs()
             imgui.new_frame()
+            # note: textures decoded in background since last frame
+            loader.update()
             self.display()
+            canvas.flush()
             imgui.render()
             self.renderer.render(imgui.get_draw_data())
+            # note: imgui renderer changes GL state behind our back
+            gl_state.invalidate()
+            blending.current().apply()
 
         finally:
-            gl.glBindVertexArray(0)
-            gl.glUseProgram(0)
-
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+            # note: program, VAO and buffer bindings are left as they are
+            #       because all gl2dl binds go through gl_state anyway
+            gl_state.bind_framebuffer(0)
 
             glfw.swap_buffers(self.window)
 
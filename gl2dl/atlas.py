@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from PIL import Image
+import numpy as np
+
+from .sprites import AnimationFrames
+from .textures import Texture
+
+
+class SubTexture(AnimationFrames):
+    """ Lightweight handle of single image packed in :class:`TextureAtlas`
+
+    Can be used in place of :class:`gl2dl.sprites.Texture` (and
+    :class:`gl2dl.sprites.StaticAnimationAtlas` if image is a grid of
+    animation frames) by sprites, so all sprites of the atlas share the
+    same texture binding and can be batched together.
+    """
+
+    def __init__(self, page, x, y, width, height, subsheets=None):
+        """
+        :param page: atlas page texture the image is packed in
+        :param x: left edge of the image in page pixels
+        :param y: bottom edge of the image in page pixels
+        :param width: image width
+        :param height: image height
+        :param subsheets: animation subsheets if image is a frame grid
+        """
+        self.page = page
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.subsheets = subsheets
+
+        self.uv_rect = (
+            float(x) / page.width, float(y) / page.height,
+            float(width) / page.width, float(height) / page.height,
+        )
+
+    @property
+    def texture(self):
+        """ GL texture name of the atlas page """
+        return self.page.texture
+
+    def __repr__(self):
+        return "<SubTexture {}x{} at ({}, {}) of {}>".format(
+            self.width, self.height, self.x, self.y, self.page
+        )
+
+
+class TextureAtlas(object):
+    """ Runtime texture atlas packing many images into few large textures
+
+    Images are added with :meth:`add` and packed into pages with
+    :meth:`build` that returns :class:`SubTexture` handles by image name.
+    Packing places images sorted by decreasing height on shelves (rows)
+    and opens new page only when image does not fit anywhere else.
+
+    Every image is surrounded by ``padding`` pixels filled with copies of
+    its edge pixels so sampling near image edges (filtering, mipmaps,
+    scaled sprites) does not bleed neighbouring images.
+    """
+
+    def __init__(self, size=1024, padding=1, mode="RGBA"):
+        """
+        :param size: width and height of atlas pages in pixels
+        :param padding: number of pixels extruded around every image
+        :param mode: PIL mode of uploaded pixels
+        """
+        self.size = size
+        self.padding = padding
+        self.mode = mode
+
+        self.pages = []
+        self._images = {}
+        self._subsheets = {}
+        self._sub_textures = None
+
+    def add(self, name, image, subsheets=None):
+        """ Add image to be packed on next :meth:`build`
+
+        :param name: name of the image in the atlas
+        :param image: image file name or PIL image
+        :param subsheets: animation subsheets of image that is a grid of
+            animation frames
+        """
+        if self._sub_textures is not None:
+            raise RuntimeError("Cannot add images to already built atlas")
+
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+
+        image = image.convert(self.mode)
+        padded = max(image.size) + 2 * self.padding
+
+        if padded > self.size:
+            raise ValueError(
+                "Image {!r} of size {}x{} does not fit {} atlas page".format(
+                    name, image.size[0], image.size[1], self.size
+                )
+            )
+
+        self._images[name] = image
+        self._subsheets[name] = subsheets
+
+    def __getitem__(self, name):
+        return self._sub_textures[name]
+
+    def __contains__(self, name):
+        return name in self._images
+
+    def __len__(self):
+        return len(self._images)
+
+    def _pack(self):
+        """ Return page index and top-left slot corner of every image
+
+        :return: (placements, page count) tuple where placements is dict of
+            name -> (page, x, y) in top-down pixel coordinates
+        """
+        padding = self.padding
+        placements = {}
+        # note: every shelf is [page, top, height, used width]
+        shelves = []
+        # note: first free row of every page
+        page_heights = []
+
+        for name, image in sorted(
+            self._images.items(), key=lambda item: -item[1].size[1]
+        ):
+            width = image.size[0] + 2 * padding
+            height = image.size[1] + 2 * padding
+
+            for shelf in shelves:
+                if height <= shelf[2] and shelf[3] + width <= self.size:
+                    break
+            else:
+                for page, top in enumerate(page_heights):
+                    if top + height <= self.size:
+                        break
+                else:
+                    page, top = len(page_heights), 0
+                    page_heights.append(0)
+
+                shelf = [page, top, height, 0]
+                shelves.append(shelf)
+                page_heights[page] = top + height
+
+            placements[name] = shelf[0], shelf[3], shelf[1]
+            shelf[3] += width
+
+        return placements, len(page_heights)
+
+    def build(self):
+        """ Pack all images into pages and upload them
+
+        Must be called with current GL context.
+
+        :return: dict of image name -> :class:`SubTexture`
+        """
+        if self._sub_textures is not None:
+            return self._sub_textures
+
+        placements, page_count = self._pack()
+        padding = self.padding
+        bands = len(self.mode)
+
+        pixels = [
+            np.zeros((self.size, self.size, bands), dtype=np.uint8)
+            for _ in range(page_count)
+        ]
+
+        for name, (page, x, y) in placements.items():
+            image = np.asarray(self._images[name]).reshape(
+                self._images[name].size[1], self._images[name].size[0], bands
+            )
+            # note: padding is filled with copies of edge pixels
+            padded = np.pad(
+                image, ((padding, padding), (padding, padding), (0, 0)),
+                mode='edge',
+            )
+            pixels[page][y:y + padded.shape[0], x:x + padded.shape[1]] = padded
+
+        self.pages = [
+            Texture(Image.fromarray(page.squeeze()), self.mode)
+            for page in pixels
+        ]
+
+        self._sub_textures = {}
+
+        for name, (page, x, y) in placements.items():
+            width, height = self._images[name].size
+
+            self._sub_textures[name] = SubTexture(
+                self.pages[page],
+                x + padding,
+                # note: textures are uploaded bottom-up
+                self.size - (y + padding + height),
+                width, height,
+                self._subsheets[name],
+            )
+
+        # note: source images are not needed once pages are uploaded
+        self._images = dict.fromkeys(self._images)
+
+        return self._sub_textures
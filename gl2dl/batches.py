@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import OpenGL.GL as gl
+import numpy as np
+
+from .buffers import StreamingBuffer, VertexBuffer
+from .primitives import quad_index_buffer, rects_quads
+from .shaders import programs
+from .state import gl_state
+from .uniforms import frame_uniforms
+from .vertices import VEC2, VertexFormat
+
+
+class Arena(object):
+    """ Mixin of batches that queue records into growing numpy arrays
+
+    Subclasses create arrays for given capacity in :meth:`_allocate`. All
+    arrays named in ``_PER_RECORD`` (``_arena`` first) have one item per
+    record and keep queued records when they grow. Views derived from them
+    (e.g. plain float views) are just created again by :meth:`_allocate`.
+    """
+    _PER_RECORD = ('_arena',)
+
+    def _allocate(self, capacity):
+        raise NotImplementedError
+
+    def _extend(self, count):
+        """ Return (start, stop) of ``count`` new records
+
+        Arrays are reallocated (at least doubled) when they are full so
+        queuing stays amortized O(1) per record.
+        """
+        start, stop = self._count, self._count + count
+
+        if stop > len(self._arena):
+            kept = [getattr(self, name)[:start] for name in self._PER_RECORD]
+            self._allocate(max(stop, 2 * len(self._arena)))
+
+            for name, records in zip(self._PER_RECORD, kept):
+                getattr(self, name)[:start] = records
+
+        self._count = stop
+        return start, stop
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        """ Drop all queued records without drawing them """
+        self._count = 0
+
+
+class InstancedQuadBatch(Arena):
+    """ Base of batches drawing instances of shared unit quad
+
+    Subclasses provide ``vertex_code`` and ``fragment_code`` (unit quad
+    corner is at location 0 and ``texture_sampler`` uses unit 0),
+    ``INSTANCE_DTYPE`` of per-instance attributes bound from location 1 in
+    field order, per-draw uniforms in :meth:`_set_uniforms` and textures of
+    instance ranges in :meth:`_groups`.
+
+    Instances are streamed and dropped on every :meth:`draw` unless
+    ``RETAINED`` is set. Retained instances are kept between frames and
+    uploaded only when they change (see :meth:`changed`).
+    """
+    vertex_code = None
+    fragment_code = None
+
+    INSTANCE_DTYPE = None
+    RETAINED = False
+    TEXTURE_TARGET = gl.GL_TEXTURE_2D
+
+    def __init__(self, capacity=256):
+        """
+        :param capacity: initial number of instances to allocate for
+        """
+        self._allocate(capacity)
+        self._count = 0
+        self._changed = False
+
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
+        self._format = VertexFormat(
+            self.INSTANCE_DTYPE, first_location=1, divisor=1
+        )
+
+        self.VAO = gl.glGenVertexArrays(1)
+        gl_state.bind_vertex_array(self.VAO)
+
+        self._quad = VertexBuffer(gl.GL_STATIC_DRAW)
+        self._quad.upload(rects_quads([0, 0, 1, 1]))
+        VertexFormat(VEC2).setup()
+        quad_index_buffer.attach()
+
+        if self.RETAINED:
+            self._instances = VertexBuffer()
+        else:
+            self._instances = StreamingBuffer()
+        self._instances.bind()
+        self._format.setup()
+
+        gl_state.bind_vertex_array(0)
+
+        # note: number of draw calls issued by last draw (for debugging)
+        self.draw_calls = 0
+
+    def _allocate(self, capacity):
+        self._arena = np.zeros(capacity, dtype=self.INSTANCE_DTYPE)
+
+    def _extend(self, count):
+        self._changed = True
+        return super(InstancedQuadBatch, self)._extend(count)
+
+    def changed(self):
+        """ Mark instances as changed so they are uploaded on next draw """
+        self._changed = True
+
+    def _set_uniforms(self, active):
+        """ Set uniforms of bound program shared by all instances """
+
+    def _groups(self):
+        """ Return (start, stop, texture) of instances drawn together """
+        raise NotImplementedError
+
+    def _upload(self):
+        """ Upload instances if needed and return their offset in bytes """
+        if not self.RETAINED:
+            return self._instances.write(self._arena[:self._count])
+
+        if self._changed:
+            self._instances.upload(self._arena[:self._count])
+            self._changed = False
+
+        return 0
+
+    def draw(self, camera=None):
+        """ Draw instances with one instanced draw call per group
+
+        Instances of batches that are not retained are dropped afterwards.
+        """
+        self.draw_calls = 0
+
+        if not self._count:
+            return
+
+        frame_uniforms.use(camera)
+        # note: groups are resolved first since it may reorder instances
+        groups = self._groups()
+        offset = self._upload()
+
+        with self._shader as active:
+            active['texture_sampler'] = 0
+            self._set_uniforms(active)
+
+            gl_state.bind_vertex_array(self.VAO)
+            self._instances.bind()
+
+            for start, stop, texture in groups:
+                # note: there is no base instance in GL 3.3 so instance
+                #       attributes are pointed at first instance of group
+                self._format.setup(
+                    offset + start * self.INSTANCE_DTYPE.itemsize
+                )
+                gl_state.bind_texture(
+                    texture, unit=0, target=self.TEXTURE_TARGET
+                )
+                quad_index_buffer.draw(1, instances=stop - start)
+
+                self.draw_calls += 1
+
+        if not self.RETAINED:
+            self._instances.fence()
+            self._count = 0
+
+    def delete(self):
+        """ Release GL objects and shader program of the batch """
+        self._quad.delete()
+        self._instances.delete()
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
+
+        programs.release(self._shader)
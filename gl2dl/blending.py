@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 from contextlib import contextmanager
+from dataclasses import dataclass
 from functools import partial
 
 import OpenGL.GL as gl
 
+from .state import gl_state
+
 
 class Mode(object):
     REVERSE_SUBTRACT = gl.GL_FUNC_REVERSE_SUBTRACT
@@ -31,7 +34,79 @@ class Factor(object):
     ONE_MINUS_CONSTANT_ALPHA = gl.GL_ONE_MINUS_CONSTANT_ALPHA
 
 
+@dataclass(frozen=True)
+class BlendState:
+    """ Immutable and hashable description of complete blending state
+
+    Default instance describes initial state of GL context (blending
+    disabled).
+    """
+    enabled: bool = False
+
+    rgb_source: int = Factor.ONE
+    rgb_destination: int = Factor.ZERO
+
+    alpha_source: int = Factor.ONE
+    alpha_destination: int = Factor.ZERO
+
+    rgb_mode: int = Mode.ADD
+    alpha_mode: int = Mode.ADD
+
+    @classmethod
+    def simple(cls, source, destination, mode=Mode.ADD):
+        """ Create state with same factors and mode for color and alpha """
+        return cls(True, source, destination, source, destination, mode, mode)
+
+    def apply(self):
+        gl_state.enable_blend(self.enabled)
+
+        # note: factors and equations of disabled blending do not matter so
+        #       there is no need to change them
+        if self.enabled:
+            gl_state.blend_equation(self.rgb_mode, self.alpha_mode)
+            gl_state.blend_func(
+                self.rgb_source, self.rgb_destination,
+                self.alpha_source, self.alpha_destination,
+            )
+
+
+DISABLED = BlendState()
+
+# note: bottom of the stack is the initial state of GL context. Blending is
+#       tracked entirely on CPU side so entering and leaving blend contexts
+#       never has to query the driver with glGet*()
+_stack = [DISABLED]
+
+
+def current():
+    """ Return blend state that is currently in effect """
+    return _stack[-1]
+
+
+def push(blend_state):
+    _stack.append(blend_state)
+    blend_state.apply()
+
+
+def pop():
+    if len(_stack) == 1:
+        raise RuntimeError("Cannot pop initial blend state")
+
+    _stack.pop()
+    _stack[-1].apply()
+
+
 @contextmanager
+def applied(blend_state):
+    """ Use given :class:`BlendState` for the duration of the context """
+    push(blend_state)
+
+    try:
+        yield
+    finally:
+        pop()
+
+
 def blending_rgba(
         rgb_source=Factor.ONE,
         rgb_destination=Factor.ZERO,
@@ -51,40 +126,14 @@ def blending_rgba(
     :param alpha_mode:
 
     """
-    enabled = gl.glGetBoolean(gl.GL_BLEND)
-
-    if not enabled:
-        gl.glEnable(gl.GL_BLEND)
-
-    old_rgb_source = gl.glGetInteger(gl.GL_BLEND_SRC_RGB)
-    old_rgb_destination = gl.glGetInteger(gl.GL_BLEND_DST_RGB)
-    old_alpha_source = gl.glGetInteger(gl.GL_BLEND_SRC_ALPHA)
-    old_alpha_destination = gl.glGetInteger(gl.GL_BLEND_DST_ALPHA)
-    old_rgb_mode = gl.glGetInteger(gl.GL_BLEND_EQUATION_RGB)
-    old_alpha_mode = gl.glGetInteger(gl.GL_BLEND_EQUATION_ALPHA)
-
-    gl.glEnable(gl.GL_BLEND)
-    gl.glBlendEquationSeparate(rgb_mode, alpha_mode)
-    gl.glBlendFuncSeparate(
+    return applied(BlendState(
+        True,
         rgb_source, rgb_destination,
-        alpha_source, alpha_destination
-    )
-
-    try:
-        yield
-    finally:
-        if enabled:
-            gl.glBlendEquationSeparate(old_rgb_mode, old_alpha_mode)
-            gl.glBlendFuncSeparate(
-                old_rgb_source, old_rgb_destination,
-                old_alpha_source, old_alpha_destination
-            )
-        else:
-            gl.glBlendEquationSeparate(old_rgb_mode, old_alpha_mode)
-            gl.glDisable(gl.GL_BLEND)
+        alpha_source, alpha_destination,
+        rgb_mode, alpha_mode,
+    ))
 
 
-@contextmanager
 def blending(
         source=Factor.ONE,
         destination=Factor.ZERO,
@@ -96,26 +145,7 @@ def blending(
     :param mode:
 
     """
-    enabled = gl.glGetBoolean(gl.GL_BLEND)
-    old_mode = gl.glGetInteger(gl.GL_BLEND_EQUATION)
-    old_source = gl.glGetInteger(gl.GL_BLEND_SRC)
-    old_destination = gl.glGetInteger(gl.GL_BLEND_DST)
-
-    if not enabled:
-        gl.glEnable(gl.GL_BLEND)
-
-    gl.glBlendEquation(mode)
-    gl.glBlendFunc(source, destination)
-
-    try:
-        yield
-
-    finally:
-        if enabled:
-            gl.glBlendEquation(old_mode)
-            gl.glBlendFunc(old_source, old_destination)
-        else:
-            gl.glDisable(gl.GL_BLEND)
+    return applied(BlendState.simple(source, destination, mode))
 
 
 alpha_blend = partial(
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+import ctypes
+
+import OpenGL.GL as gl
+import numpy as np
+
+from .state import gl_state
+
+
+class VertexBuffer(object):
+    """ GL array buffer that keeps track of its allocated storage
+
+    Storage is (re)allocated with ``glBufferData`` only when it needs to
+    grow. Otherwise data is written in place with ``glBufferSubData``.
+    """
+
+    def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
+        self.handle = gl.glGenBuffers(1)
+        self.usage = usage
+        # note: allocated storage size in bytes
+        self.capacity = 0
+
+    def bind(self):
+        gl_state.bind_array_buffer(self.handle)
+
+    def reserve(self, nbytes):
+        """ Make sure buffer can hold ``nbytes`` of data
+
+        :return: True if storage was reallocated (and its content is lost)
+        """
+        if nbytes <= self.capacity:
+            return False
+
+        self.bind()
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, nbytes, None, self.usage)
+        self.capacity = nbytes
+
+        return True
+
+    def upload(self, data):
+        """ Replace buffer content with ``data`` """
+        self.bind()
+
+        if data.nbytes > self.capacity:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, data, self.usage)
+            self.capacity = data.nbytes
+        else:
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+    def update(self, offset, data):
+        """ Write ``data`` at ``offset`` bytes without reallocating storage """
+        self.bind()
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, offset, data.nbytes, data)
+
+    def delete(self):
+        gl.glDeleteBuffers(1, [self.handle])
+        gl_state.deleted_array_buffer(self.handle)
+        self.capacity = 0
+
+
+class FencedRing(object):
+    """ Mixin for rings of storage slots guarded by GPU fences
+
+    Subclasses keep one fence per slot in ``_fences`` list. Slot can be
+    written again only after its fence (placed after commands reading
+    the slot) is signaled.
+    """
+    # note: how long to wait for GPU in single glClientWaitSync call (in ns)
+    WAIT_TIMEOUT = 1000000
+
+    def _place_fence(self, slot):
+        self._delete_fence(slot)
+        self._fences[slot] = gl.glFenceSync(
+            gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0
+        )
+
+    def _wait(self, slot):
+        fence = self._fences[slot]
+
+        if fence is None:
+            return
+
+        while gl.glClientWaitSync(
+            fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, self.WAIT_TIMEOUT
+        ) == gl.GL_TIMEOUT_EXPIRED:
+            pass
+
+        self._delete_fence(slot)
+
+    def _delete_fence(self, slot):
+        if self._fences[slot] is not None:
+            gl.glDeleteSync(self._fences[slot])
+            self._fences[slot] = None
+
+    def _drop_fences(self):
+        # note: reallocation makes GL wait for pending draws anyway
+        for slot in range(len(self._fences)):
+            self._delete_fence(slot)
+
+
+class StreamingBuffer(FencedRing, VertexBuffer):
+    """ GL array buffer for geometry that is replaced on every frame
+
+    With single segment every :meth:`write` orphans the storage (re-specifies
+    it with ``glBufferData`` and no data) so driver can hand out fresh
+    memory instead of waiting until GPU finishes reading previous frame.
+
+    With more segments storage is split into a ring of fixed-size segments.
+    Every write goes to the next segment through unsynchronized mapping and
+    waits only for the fence of the draw that used this segment ``segments``
+    writes ago, so storage is never re-specified. Data lands at different
+    offsets so drawables have to use :attr:`offset` when drawing and call
+    :meth:`fence` after each draw.
+
+    In both modes storage grows geometrically and only when written data
+    does not fit in a segment.
+    """
+    def __init__(self, segments=1, usage=gl.GL_STREAM_DRAW):
+        super(StreamingBuffer, self).__init__(usage)
+        self.segments = segments
+        self.segment_size = 0
+        # note: byte offset of data from last write
+        self.offset = 0
+
+        self._segment = 0
+        self._fences = [None] * segments
+
+    def reserve(self, nbytes):
+        """ Make sure every segment can hold ``nbytes`` of data
+
+        :return: True if storage was reallocated (and its content is lost)
+        """
+        if nbytes <= self.segment_size:
+            return False
+
+        self._drop_fences()
+        self.segment_size = max(nbytes, 2 * self.segment_size)
+
+        self.bind()
+        self.capacity = self.segment_size * self.segments
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, self.capacity, None, self.usage)
+
+        return True
+
+    def write(self, data):
+        """ Write ``data`` to fresh storage without stalling on the GPU
+
+        :return: byte offset at which data was written (same as
+            :attr:`offset`)
+        """
+        data = np.ascontiguousarray(data)
+
+        if not self.reserve(data.nbytes) and self.segments == 1:
+            # note: orphan storage, GPU may still read the previous one
+            self.bind()
+            gl.glBufferData(
+                gl.GL_ARRAY_BUFFER, self.capacity, None, self.usage
+            )
+
+        if self.segments == 1:
+            self.offset = 0
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+        else:
+            self._segment = (self._segment + 1) % self.segments
+            self.offset = self._segment * self.segment_size
+            self._wait(self._segment)
+
+            self.bind()
+            pointer = gl.glMapBufferRange(
+                gl.GL_ARRAY_BUFFER, self.offset, data.nbytes,
+                gl.GL_MAP_WRITE_BIT |
+                gl.GL_MAP_INVALIDATE_RANGE_BIT |
+                gl.GL_MAP_UNSYNCHRONIZED_BIT
+            )
+            ctypes.memmove(pointer, data.ctypes.data, data.nbytes)
+            gl.glUnmapBuffer(gl.GL_ARRAY_BUFFER)
+
+        return self.offset
+
+    def fence(self):
+        """ Mark current segment as used by draw calls issued so far """
+        if self.segments == 1:
+            return
+
+        self._place_fence(self._segment)
+
+    def delete(self):
+        self._drop_fences()
+        super(StreamingBuffer, self).delete()
+        self.segment_size = 0
+
+
+class PixelBufferPool(FencedRing):
+    """ Pool of pixel unpack buffers for asynchronous texture uploads
+
+    Pixels are copied into next buffer of the pool and texture is updated
+    from the buffer, so ``glTexSubImage*`` returns right away and transfer
+    to the texture happens on GPU timeline instead of blocking CPU. Buffer
+    is written again only after GPU finished the transfer that used it
+    ``count`` uploads ago.
+
+    Usage::
+
+        pool.write(pixels)
+        gl.glTexSubImage2D(..., ctypes.c_void_p(0))
+        pool.fence()
+    """
+
+    def __init__(self, count=3, usage=gl.GL_STREAM_DRAW):
+        self.count = count
+        self.usage = usage
+
+        # note: buffers are created on first write so module-level pools
+        #       can be created before GL context
+        self.handles = None
+        self.capacities = [0] * count
+
+        self._index = 0
+        self._fences = [None] * count
+
+    def write(self, data):
+        """ Copy ``data`` to next buffer and leave it bound for unpacking """
+        data = np.ascontiguousarray(data)
+
+        if self.handles is None:
+            self.handles = list(gl.glGenBuffers(self.count))
+
+        self._index = (self._index + 1) % self.count
+        self._wait(self._index)
+
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self.handles[self._index])
+
+        if data.nbytes > self.capacities[self._index]:
+            gl.glBufferData(
+                gl.GL_PIXEL_UNPACK_BUFFER, data.nbytes, None, self.usage
+            )
+            self.capacities[self._index] = data.nbytes
+
+        pointer = gl.glMapBufferRange(
+            gl.GL_PIXEL_UNPACK_BUFFER, 0, data.nbytes,
+            gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_RANGE_BIT
+        )
+        ctypes.memmove(pointer, data.ctypes.data, data.nbytes)
+        gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+
+    def fence(self):
+        """ Mark written buffer as used by uploads issued so far and unbind it
+
+        note: pixel unpack buffer has to be unbound because while it is
+              bound all texture uploads read from it instead of client memory
+        """
+        self._place_fence(self._index)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def delete(self):
+        self._drop_fences()
+
+        if self.handles is not None:
+            gl.glDeleteBuffers(self.count, self.handles)
+            self.handles = None
+
+        self.capacities = [0] * self.count
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+class Camera(object):
+    """ 2D camera describing which part of the world is visible on screen.
+
+    Camera is defined by its position (world point shown in the lower-left
+    corner of the window), zoom and viewport size. View, projection and
+    view-projection matrices are cached and recomputed only after any of
+    these parameters (or window size when camera has no explicit viewport)
+    changes, so camera can be passed to every draw call for free.
+
+    Every change bumps :attr:`version` so consumers like
+    :class:`gl2dl.uniforms.FrameUniforms` can cheaply tell if they need to
+    upload new matrices.
+    """
+
+    def __init__(self, position=(0, 0), zoom=1., viewport=None):
+        """
+        :param position: world position of lower-left corner of the window
+        :param zoom: zoom factor, values greater than 1 magnify the world
+        :param viewport: (width, height) of visible world area at zoom 1.
+            If None then window size is used so one world unit is one
+            window pixel.
+        """
+        self._position = tuple(position)
+        self._zoom = float(zoom)
+        self._viewport = tuple(viewport) if viewport is not None else None
+
+        self.version = 0
+        self._key = None
+        self._view = None
+        self._projection = None
+        self._view_projection = None
+
+    def _changed(self):
+        self.version += 1
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        value = tuple(value)
+
+        if value != self._position:
+            self._position = value
+            self._changed()
+
+    @property
+    def zoom(self):
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, value):
+        value = float(value)
+
+        if value != self._zoom:
+            self._zoom = value
+            self._changed()
+
+    @property
+    def viewport(self):
+        return self._viewport
+
+    @viewport.setter
+    def viewport(self, value):
+        value = tuple(value) if value is not None else None
+
+        if value != self._viewport:
+            self._viewport = value
+            self._changed()
+
+    def move(self, dx, dy):
+        """ Scroll camera by given offset in world units """
+        self.position = self._position[0] + dx, self._position[1] + dy
+
+    def matrices(self, width, height):
+        """ Return cached view, projection and view-projection matrices
+
+        Matrices are row-major 4x4 ``np.float32`` arrays and must not be
+        modified in place.
+
+        :param width: window width used when camera has no viewport
+        :param height: window height used when camera has no viewport
+        :return: (view, projection, view_projection) tuple
+        """
+        key = self.version, width, height
+
+        if key != self._key:
+            self._key = key
+            self._update(*(self._viewport or (width, height)))
+
+        return self._view, self._projection, self._view_projection
+
+    def view_projection(self, width, height):
+        return self.matrices(width, height)[2]
+
+    def _update(self, width, height):
+        x, y = self._position
+        zoom = self._zoom
+
+        self._view = np.array([
+            [zoom, 0,    0, -x * zoom],
+            [0,    zoom, 0, -y * zoom],
+            [0,    0,    1, 0],
+            [0,    0,    0, 1.],
+        ], dtype=np.float32)
+
+        self._projection = np.array([
+            [2. / width, 0,           0,  -1],
+            [0,          2. / height, 0,  -1],
+            [0,          0,           -2, -1],
+            [0,          0,           0,  1.],
+        ], dtype=np.float32)
+
+        self._view_projection = self._projection.dot(self._view)
+
+    def screen_to_world(self, x, y, width, height):
+        """ Convert window coordinates (origin in lower-left corner) to world
+
+        Useful for translating mouse position. Remember to flip mouse y
+        coordinate first since windowing toolkits report it from the top.
+        """
+        view_width, view_height = self._viewport or (width, height)
+
+        return (
+            self._position[0] + x * view_width / (width * self._zoom),
+            self._position[1] + y * view_height / (height * self._zoom),
+        )
+
+    def world_to_screen(self, x, y, width, height):
+        """ Convert world coordinates to window coordinates """
+        view_width, view_height = self._viewport or (width, height)
+
+        return (
+            (x - self._position[0]) * self._zoom * width / view_width,
+            (y - self._position[1]) * self._zoom * height / view_height,
+        )
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+from functools import lru_cache
+
+import OpenGL.GL as gl
+import numpy as np
+
+from . import blending
+from .batches import Arena
+from .buffers import StreamingBuffer
+from .primitives import Triangles, rects_triangles
+from .shaders import programs
+from .state import gl_state
+from .uniforms import frame_uniforms
+from .vertices import POSITION_COLOR
+
+WHITE = (1, 1, 1, 1)
+
+
+@lru_cache(maxsize=None)
+def _unit_circle(segments):
+    """ Return (segments + 1, 2) points of unit circle (first == last) """
+    angles = np.linspace(0, 2 * np.pi, segments + 1, dtype=np.float32)
+    return np.stack((np.cos(angles), np.sin(angles)), axis=1)
+
+
+class _ProjectionSnapshot(object):
+    """ Camera stand-in that keeps projection of the moment it was taken
+
+    Used by canvas to draw queued shapes with projection they were queued
+    with even if the camera moved (or window was resized) since.
+    """
+    version = 0
+
+    def __init__(self, projection):
+        self.projection = projection
+
+    def view_projection(self, width, height):
+        return self.projection
+
+
+class Canvas(Arena):
+    """ Immediate-mode drawing of colored shapes batched into few draw calls
+
+    Every call (:meth:`rect`, :meth:`triangle`, :meth:`line`,
+    :meth:`circle` and their vectorized variants) only appends triangle
+    vertices to growing CPU-side arena. Shapes are drawn with single draw
+    call on :meth:`flush` which apps call at the end of every frame.
+
+    Canvas records the state shapes are queued under and flushes queued
+    shapes (drawing them with the recorded state) before adding shapes
+    under different state. State that triggers flush is:
+
+    * blend state (see :func:`gl2dl.blending.current`)
+    * bound framebuffer and viewport set through :data:`gl_state`
+    * camera (canvas camera or frame camera), including camera moves
+    * frame size of :data:`gl2dl.uniforms.frame_uniforms`
+
+    :meth:`gl2dl.framebuffers.FrameBuffer.to_texture` also flushes the
+    default canvas when it is entered and left.
+
+    note: queued shapes are drawn on flush so anything drawn directly
+          in between ends up below them. Call :meth:`flush` before drawing
+          other objects if order matters. State changed directly with GL
+          calls (not through gl_state) is not tracked either.
+    """
+
+    def __init__(self, camera=None, capacity=4096):
+        """
+        :param camera: optional camera for drawn shapes, frame camera is
+            used if not set
+        :param capacity: initial capacity of arena in vertices
+        """
+        self.camera = camera
+
+        self._allocate(capacity)
+        self._count = 0
+        # note: state recorded for queued shapes (see _current_state)
+        self._state = None
+        self._blend_state = None
+        self._framebuffer = None
+        self._viewport = None
+        self._projection = None
+
+        # note: GL objects are created on first flush so module-level
+        #       canvas can be created before GL context
+        self._shader = None
+        self._vertices = None
+        self.VAO = None
+
+        # note: number of draw calls issued so far (for debugging)
+        self.draw_calls = 0
+
+    def _allocate(self, capacity):
+        self._arena = POSITION_COLOR.zeros(capacity)
+        # note: plain (N, 6) float view of the arena (x, y, r, g, b, a)
+        #       because writing it is much faster than structured fields
+        self._floats = self._arena.view(np.float32).reshape(capacity, 6)
+
+    def _setup(self):
+        # note: same program as Triangles so it is shared in the registry
+        self._shader = programs.acquire(
+            Triangles.vertex_code, Triangles.fragment_code
+        )
+        self._vertices = StreamingBuffer()
+
+        self.VAO = gl.glGenVertexArrays(1)
+        gl_state.bind_vertex_array(self.VAO)
+        self._vertices.bind()
+        POSITION_COLOR.setup()
+        gl_state.bind_vertex_array(0)
+
+    def _current_state(self):
+        camera = self.camera or frame_uniforms.camera
+
+        return (
+            blending.current(), gl_state.current_framebuffer,
+            gl_state.current_viewport,
+            camera, camera.version if camera else None,
+            frame_uniforms.width, frame_uniforms.height,
+        )
+
+    def _record(self, state):
+        self._state = state
+        self._blend_state, self._framebuffer, self._viewport = state[:3]
+
+        # note: projection is resolved now because camera can move before
+        #       the shapes are drawn
+        frame_uniforms.use(self.camera)
+        self._projection = _ProjectionSnapshot(frame_uniforms.projection)
+
+    def _reserve(self, count):
+        """ Return (count, 6) float view of arena for new vertices """
+        state = self._current_state()
+
+        if state != self._state:
+            if self._count:
+                self.flush()
+            self._record(state)
+
+        start, stop = self._extend(count)
+        return self._floats[start:stop]
+
+    def _append(self, positions, colors, per_shape):
+        """ Append triangle vertices of shapes
+
+        :param positions: (N * per_shape, 2) array of vertex positions
+        :param colors: single color or (N, 4) array of per-shape colors
+        :param per_shape: number of vertices of single shape
+        """
+        vertices = self._reserve(len(positions))
+        vertices[:, :2] = positions
+
+        colors = np.asarray(colors, dtype=np.float32)
+        if colors.ndim == 2:
+            colors = np.repeat(colors, per_shape, axis=0)
+        vertices[:, 2:] = colors
+
+    def rect(self, x, y, width, height, color=WHITE):
+        # note: single shapes are written without temporary arrays because
+        #       they are usually drawn in big numbers of separate calls
+        x2, y2 = x + width, y + height
+
+        vertices = self._reserve(6)
+        vertices[:, :2] = (x, y), (x, y2), (x2, y2), (x2, y), (x2, y2), (x, y)
+        vertices[:, 2:] = color
+
+    def rects(self, rects, colors=WHITE):
+        """ Vectorized :meth:`rect`
+
+        :param rects: (N, 4) array of x, y, width, height
+        :param colors: (N, 4) array of colors or single color for all
+        """
+        self._append(rects_triangles(rects), colors, 6)
+
+    def triangle(self, p1, p2, p3, color=WHITE):
+        vertices = self._reserve(3)
+        vertices[:, :2] = p1, p2, p3
+        vertices[:, 2:] = color
+
+    def triangles(self, points, colors=WHITE):
+        """ Vectorized :meth:`triangle`
+
+        :param points: (N * 3, 2) array of vertices of consecutive triangles
+        :param colors: (N, 4) array of colors or single color for all
+        """
+        self._append(
+            np.asarray(points, dtype=np.float32).reshape(-1, 2), colors, 3
+        )
+
+    def line(self, x1, y1, x2, y2, color=WHITE, width=1.):
+        self.lines([[x1, y1]], [[x2, y2]], color, width)
+
+    def lines(self, starts, ends, colors=WHITE, width=1.):
+        """ Vectorized :meth:`line`
+
+        Lines are drawn as quads of given width (in world units) so they do
+        not depend on ``GL_LINES`` width support of core profile.
+
+        :param starts: (N, 2) array of line start points
+        :param ends: (N, 2) array of line end points
+        :param colors: (N, 4) array of colors or single color for all
+        :param width: line width
+        """
+        starts = np.asarray(starts, dtype=np.float32).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float32).reshape(-1, 2)
+
+        direction = ends - starts
+        length = np.hypot(direction[:, 0], direction[:, 1])[:, np.newaxis]
+        normals = direction[:, ::-1] * (.5 * width / np.maximum(length, 1e-6))
+        normals[:, 0] *= -1
+
+        positions = np.stack((
+            starts + normals, starts - normals, ends - normals,
+            ends - normals, ends + normals, starts + normals,
+        ), axis=1)
+
+        self._append(positions.reshape(-1, 2), colors, 6)
+
+    def circle(self, x, y, radius, color=WHITE, segments=32):
+        self.circles([[x, y]], radius, color, segments)
+
+    def circles(self, centers, radii, colors=WHITE, segments=32):
+        """ Vectorized :meth:`circle`
+
+        :param centers: (N, 2) array of circle centers
+        :param radii: (N,) array of radii or single radius for all
+        :param colors: (N, 4) array of colors or single color for all
+        :param segments: number of triangles approximating every circle
+        """
+        centers = np.asarray(centers, dtype=np.float32).reshape(-1, 2)
+        radii = np.broadcast_to(
+            np.asarray(radii, dtype=np.float32), (len(centers),)
+        )
+
+        # note: (N, segments + 1, 2) points on circumferences
+        rim = (
+            _unit_circle(segments) * radii[:, np.newaxis, np.newaxis] +
+            centers[:, np.newaxis, :]
+        )
+
+        positions = np.empty((len(centers), segments, 3, 2), dtype=np.float32)
+        positions[:, :, 0] = centers[:, np.newaxis, :]
+        positions[:, :, 1] = rim[:, :-1]
+        positions[:, :, 2] = rim[:, 1:]
+
+        self._append(positions.reshape(-1, 2), colors, 3 * segments)
+
+    def flush(self):
+        """ Draw all queued shapes and clear the queue """
+        if not self._count:
+            return
+
+        if self._shader is None:
+            self._setup()
+
+        offset = self._vertices.write(self._arena[:self._count])
+
+        # note: queued shapes are drawn with state they were queued under.
+        #       State not known to gl_state (None) is left as it is because
+        #       it could not be restored afterwards
+        framebuffer = gl_state.current_framebuffer
+        viewport = gl_state.current_viewport
+        restore_framebuffer = None not in (framebuffer, self._framebuffer)
+        restore_viewport = None not in (viewport, self._viewport)
+
+        if restore_framebuffer:
+            gl_state.bind_framebuffer(self._framebuffer)
+        if restore_viewport:
+            gl_state.viewport(*self._viewport)
+
+        frame_uniforms.use(self._projection)
+
+        with blending.applied(self._blend_state):
+            with self._shader as active:
+                active['scale'] = 1.
+                gl_state.bind_vertex_array(self.VAO)
+                gl.glDrawArrays(
+                    gl.GL_TRIANGLES,
+                    offset // POSITION_COLOR.stride, self._count
+                )
+
+        if restore_framebuffer:
+            gl_state.bind_framebuffer(framebuffer)
+        if restore_viewport:
+            gl_state.viewport(*viewport)
+
+        self._vertices.fence()
+        self.draw_calls += 1
+        self._count = 0
+
+    def delete(self):
+        """ Release GL objects and shader program of the canvas
+
+        Queued shapes are dropped. Canvas can still be used afterwards,
+        GL objects are created again on next flush.
+        """
+        self._count = 0
+
+        if self._shader is None:
+            return
+
+        self._vertices.delete()
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
+
+        programs.release(self._shader)
+
+        self._shader = None
+        self._vertices = None
+        self.VAO = None
+
+
+# note: default canvas flushed by apps at the end of every frame
+canvas = Canvas()
@@ -3,20 +3,24 @@ from contextlib import contextmanager
 
 import OpenGL.GL as gl
 
+from gl2dl.canvas import canvas
 from gl2dl.sprites import Sprite
+from gl2dl.state import gl_state
 
 
 class FrameBufferTexture(object):
     """
     todo: very similar to Texture class, consider refactoring
     """
+    uv_rect = (0., 0., 1., 1.)
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
 
         # GL texture object initialization
         self.texture = gl.glGenTextures(1)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl_state.bind_texture(self.texture)
         # note: we pass pixels=None because our texture is not initialized
         gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGB, width, height, 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, None)  # noqa
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)  # noqa
@@ -35,13 +39,18 @@ class FrameBuffer(object):
     @contextmanager
     def to_texture(self, framebuffer_texture):
 
-        # old_framebuffer = gl.glGetInteger(gl.GL_FRAMEBUFFER)
-        old_framebuffer = 0
-        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._framebuffer)
+        # note: canvas shapes queued outside go to the old framebuffer and
+        #       shapes queued inside have to be in the texture once it is
+        #       left (e.g. to be drawn right after)
+        canvas.flush()
+
+        old_framebuffer = gl_state.framebuffer
+        gl_state.bind_framebuffer(self._framebuffer)
         gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D, framebuffer_texture.texture, 0)
 
         try:
             yield
         finally:
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, old_framebuffer)
+            canvas.flush()
+            gl_state.bind_framebuffer(old_framebuffer)
 
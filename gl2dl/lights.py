@@ -2,9 +2,10 @@
 import OpenGL.GL as gl
 
 from . import blending
-from .shaders import ShaderProgram
-from .primitives import ortho
-from .app import window
+from .shaders import programs
+from .state import gl_state
+from .uniforms import FRAME_BLOCK, frame_uniforms
+from .vertices import POSITION
 
 import numpy as np
 
@@ -12,20 +13,18 @@ import numpy as np
 class ShadowMap(object):
     vertex_code = """
     #version 330 core
+    """ + FRAME_BLOCK + """
     layout(location = 0) in vec2 position;
 
-    uniform mat4 model_view_projection;
-
     void main()
     {
-        gl_Position = model_view_projection * vec4(position.xy, 0, 1);
+        gl_Position = projection * vec4(position.xy, 0, 1);
     }
     """
 
     geometry_code = """
     #version 330 core
     uniform vec2 light_position;
-    uniform mat4 model_view_projection;
 
     layout(triangles) in;
     layout(triangle_strip, max_vertices = 24) out;
@@ -83,57 +82,54 @@ class ShadowMap(object):
     def __init__(self, occluders):
         """
         TODO: allow passing some kind of shared buffer objects to reduce amount
-            of buffers since we will have probably more lights and also take
-            care of releasing the VBO, VAO
+            of buffers since we will have probably more lights
         TODO: customizable shadow map (length, color, etc)
         :param occluders:
         :return:
         """
 
         self._data = occluders
-        self._shader = ShaderProgram(
+        self._shader = programs.acquire(
             self.vertex_code,
             self.fragment_code,
             self.geometry_code,
         )
 
         self.VAO = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.VAO)
+        gl_state.bind_vertex_array(self.VAO)
 
         self.VBO = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
+        gl_state.bind_array_buffer(self.VBO)
         gl.glBufferData(
             gl.GL_ARRAY_BUFFER,
             self._data.nbytes,
             self._data,
             gl.GL_STATIC_DRAW
         )
-        gl.glEnableVertexAttribArray(0)
+        POSITION.setup()
+
+    def draw(self, camera=None):
+        frame_uniforms.use(camera)
 
-    def draw(self):
-        try:
-            gl.glBindVertexArray(self.VAO)
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-            gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+        gl_state.bind_vertex_array(self.VAO)
 
-            with self._shader as active:
-                model_view_projection = ortho(
-                    window.width,
-                    window.height,
-                )
-                active['model_view_projection'] = model_view_projection
+        with self._shader as active:
+            # note: precalculate position here to avoid doing this for
+            #       every vertex
+            active['light_position'] = frame_uniforms.projection.dot(
+                np.array([self.position[0], self.position[1], 0, 1])
+            )[:2]
 
-                # note: precalculate position here to avoid doing this for
-                #       every vertex
-                active['light_position'] = model_view_projection.dot(
-                    np.array([self.position[0], self.position[1], 0, 1])
-                )
+            gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(self._data))
 
-                gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(self._data))
+    def delete(self):
+        """ Release GL objects and shader program of shadow map """
+        gl.glDeleteBuffers(1, [self.VBO])
+        gl_state.deleted_array_buffer(self.VBO)
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
 
-        finally:
-            gl.glBindVertexArray(0)
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        programs.release(self._shader)
 
     @property
     def position(self):
@@ -149,6 +145,24 @@ class ShadowMap(object):
 
 class GLight(object):
     # todo: add bleed param by moving occluder shadows on axis
+
+    # note:
+    # * blending destination: rendered light
+    # * blending source: rendered shadows
+    #   (black on black, alpha=1 for shadow polygon)
+    SHADOW_BLENDING = blending.BlendState(
+        True,
+        # no color wherever there is shadow polygon
+        # 0 + 0
+        rgb_mode=blending.Mode.ADD,
+        rgb_source=blending.Factor.ZERO,
+        rgb_destination=blending.Factor.ZERO,
+
+        # 0 + (inverted shadow alpha) * (light alpha)
+        alpha_mode=blending.Mode.ADD,
+        alpha_source=blending.Factor.ZERO,
+        alpha_destination=blending.Factor.ONE_MINUS_SRC_ALPHA,
+    )
     vertex_code = """
         #version 330 core
 
@@ -197,13 +211,12 @@ class GLight(object):
             falloff=1,
     ):
         """
-        TODO: world coordinates!
-
         :param color: light color as 3-element iterable
         :param position: position of light in world-space as 2-element iterable
+        :param radius: light radius in world units
         :param occluders: iterable for occluding traingles
         """
-        self._shader = ShaderProgram(self.vertex_code, self.fragment_code)
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
 
         self._shadows = ShadowMap(
             occluders
@@ -223,96 +236,60 @@ class GLight(object):
         ], dtype=np.float32)
 
         self.VAO = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.VAO)
+        gl_state.bind_vertex_array(self.VAO)
 
         self.VBO = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
+        gl_state.bind_array_buffer(self.VBO)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, gl.GL_STATIC_DRAW)
-        gl.glEnableVertexAttribArray(0)
-
-    @property
-    def color(self):
-        return self._shader['light_color']
-
-    @color.setter
-    def color(self, value):
-        self._shader.bind()
-        self._shader['light_color'] = value
+        POSITION.setup()
 
     @property
     def position(self):
-        return self._shader['light_position']
+        return self._position
 
     @position.setter
     def position(self, value):
-        with self._shader as active:
-            active['light_position'] = value
+        self._position = value
 
         if self._shadows:
             self._shadows.position = value
 
-    @property
-    def radius(self):
-        return self._shader['radius']
-
-    @radius.setter
-    def radius(self, value):
-        self._shader.bind()
-        self._shader['radius'] = value
-
-    @property
-    def intensity(self):
-        return self._shader['intensity']
-
-    @intensity.setter
-    def intensity(self, value):
-        self._shader.bind()
-        self._shader['intensity'] = value
-
-    @property
-    def falloff(self):
-        return self._shader['intensity']
-
-    @falloff.setter
-    def falloff(self, value):
-        self._shader.bind()
-        self._shader['falloff'] = value
-
-    def _cut_shadows(self):
-        # note:
-        # * blending destination: rendered light
-        # * blending source: rendered shadows
-        #   (black on black, alpha=1 for shadow polygon)
-        with blending.blending_rgba(
-                # no color wherever there is shadow polygon
-                # 0 + 0
-                rgb_mode=blending.Mode.ADD,
-                rgb_source=blending.Factor.ZERO,
-                rgb_destination=blending.Factor.ZERO,
-
-                # 0 + (inverted shadow alpha) * (light alpha)
-                alpha_mode=blending.Mode.ADD,
-                alpha_source=blending.Factor.ZERO,
-                alpha_destination=blending.Factor.ONE_MINUS_SRC_ALPHA,
-        ):
-            self._shadows.draw()
+    def _cut_shadows(self, camera=None):
+        with blending.applied(self.SHADOW_BLENDING):
+            self._shadows.draw(camera)
 
     def _draw_light(self):
-        try:
-            with self._shader:
-                self._shader.bind()
+        with self._shader as active:
+            # note: program is shared between all lights so every light
+            #       has to apply its own parameters on each draw
+            # note: light is drawn in window space
+            active['light_position'] = frame_uniforms.to_window(
+                *self.position
+            )
+            active['light_color'] = self.color
+            active['radius'] = self.radius * frame_uniforms.window_scale
+            active['intensity'] = self.intensity
+            active['falloff'] = self.falloff
+
+            gl_state.bind_vertex_array(self.VAO)
+            gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, len(self.vertices))
+
+    def draw(self, cut_shadows=True, camera=None):
+        frame_uniforms.use(camera)
 
-                gl.glBindVertexArray(self.VAO)
-                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-                gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+        self._draw_light()
+        if cut_shadows and self._shadows:
+            self._cut_shadows(camera)
 
-                gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, len(self.vertices))
+    def delete(self):
+        """ Release GL objects and shader program of light and its shadows
+        """
+        gl.glDeleteBuffers(1, [self.VBO])
+        gl_state.deleted_array_buffer(self.VBO)
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
 
-        finally:
-            gl.glBindVertexArray(0)
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        programs.release(self._shader)
 
-    def draw(self, cut_shadows=True):
-        self._draw_light()
-        if cut_shadows and self._shadows:
-            self._cut_shadows()
+        if self._shadows:
+            self._shadows.delete()
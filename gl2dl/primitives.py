@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
-import ctypes
-from dataclasses import dataclass
-
 from OpenGL import GL as gl
 import numpy as np
 
-from .shaders import ShaderProgram
-from .app import window
+from .buffers import StreamingBuffer, VertexBuffer
+from .shaders import programs
+from .state import gl_state
+from .uniforms import FRAME_BLOCK, frame_uniforms
+from .vertices import (  # noqa
+    POSITION, POSITION_COLOR, VertexFormat, Vec1, Vec2, Vec3, Vec4
+)
 
 
 def rect_triangles(x1, y1, x2, y2):
@@ -21,6 +23,136 @@ def rect_triangles(x1, y1, x2, y2):
     ], dtype=np.float32)
 
 
+# note: vertices of rect_triangles() layout as (right, top) corner flags
+RECT_TRIANGLE_CORNERS = (
+    (0, 0), (0, 1), (1, 1),
+    (1, 0), (1, 1), (0, 0),
+)
+# note: four unique corners of indexed quad and indices of its two triangles
+#       (same winding as rect_triangles())
+QUAD_CORNERS = ((0, 0), (0, 1), (1, 1), (1, 0))
+QUAD_INDICES = np.array([0, 1, 2, 3, 2, 0], dtype=np.uint32)
+
+
+def _rect_edges(rects, pivots):
+    rects = np.asarray(rects, dtype=np.float32).reshape(-1, 4)
+    pivots = np.asarray(pivots, dtype=np.float32).reshape(-1, 2)
+
+    x1 = rects[:, 0] - pivots[:, 0]
+    y1 = rects[:, 1] - pivots[:, 1]
+
+    return x1, y1, x1 + rects[:, 2], y1 + rects[:, 3]
+
+
+def corner_vertices(x1, y1, x2, y2, corners=RECT_TRIANGLE_CORNERS):
+    """ Return (N, len(corners), 2) array of rectangle corner vertices
+
+    :param x1, y1, x2, y2: (N,) arrays of rectangle edges
+    :param corners: sequence of (right, top) flags of consecutive vertices
+    """
+    vertices = np.empty((len(x1), len(corners), 2), dtype=np.float32)
+
+    # note: filling columns is several times faster than broadcasting corner
+    #       template against sizes because it creates no temporary arrays
+    for vertex, (right, top) in enumerate(corners):
+        vertices[:, vertex, 0] = x2 if right else x1
+        vertices[:, vertex, 1] = y2 if top else y1
+
+    return vertices
+
+
+def rects_triangles(rects, pivots=(0, 0)):
+    """ Vectorized :func:`rect_triangles` for many rectangles at once
+
+    Result can be used directly as :class:`gl2dl.lights.ShadowMap` occluders.
+
+    :param rects: (N, 4) array of x, y, width, height
+    :param pivots: (N, 2) array of pivots or single pivot for all rectangles
+    :return: (N*6, 2) np.ndarray of triangle vertices
+    """
+    return corner_vertices(*_rect_edges(rects, pivots)).reshape(-1, 2)
+
+
+def rects_quads(rects, pivots=(0, 0)):
+    """ Indexed variant of :func:`rects_triangles`
+
+    :param rects: (N, 4) array of x, y, width, height
+    :param pivots: (N, 2) array of pivots or single pivot for all rectangles
+    :return: (N*4, 2) np.ndarray of quad vertices to be drawn with
+        :func:`quad_indices`
+    """
+    return corner_vertices(
+        *_rect_edges(rects, pivots), corners=QUAD_CORNERS
+    ).reshape(-1, 2)
+
+
+def quad_indices(count):
+    """ Return (count*6,) element indices for ``count`` consecutive quads """
+    return (
+        QUAD_INDICES + 4 * np.arange(count, dtype=np.uint32)[:, np.newaxis]
+    ).reshape(-1)
+
+
+class QuadIndexBuffer(object):
+    """ Element buffer with pre-generated indices of consecutive quads.
+
+    Single buffer is shared by all quad-based renderers. They upload only
+    four unique vertices per quad and draw with ``glDrawElements`` which
+    also keeps post-transform vertex cache useful. Buffer grows on demand
+    and keeps its name when it grows so vertex arrays it was attached to
+    stay valid.
+    """
+    MIN_CAPACITY = 1024
+
+    def __init__(self):
+        self.handle = None
+        # note: capacity in quads
+        self.capacity = 0
+
+    def reserve(self, count):
+        """ Make sure buffer holds indices of at least ``count`` quads """
+        if count <= self.capacity:
+            return
+
+        if self.handle is None:
+            self.handle = gl.glGenBuffers(1)
+
+        capacity = max(count, 2 * self.capacity, self.MIN_CAPACITY)
+        indices = quad_indices(capacity)
+
+        # note: binding element array buffer would modify currently bound
+        #       vertex array so the copy target is used for the upload
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, self.handle)
+        gl.glBufferData(
+            gl.GL_COPY_WRITE_BUFFER, indices.nbytes, indices, gl.GL_STATIC_DRAW
+        )
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+
+        self.capacity = capacity
+
+    def attach(self, count=1):
+        """ Attach buffer to currently bound vertex array """
+        self.reserve(count)
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.handle)
+
+    @staticmethod
+    def draw(count, instances=None):
+        """ Draw ``count`` quads of currently bound vertex array """
+        if instances is None:
+            gl.glDrawElements(
+                gl.GL_TRIANGLES, count * len(QUAD_INDICES),
+                gl.GL_UNSIGNED_INT, None
+            )
+        else:
+            gl.glDrawElementsInstanced(
+                gl.GL_TRIANGLES, count * len(QUAD_INDICES),
+                gl.GL_UNSIGNED_INT, None, instances
+            )
+
+
+quad_index_buffer = QuadIndexBuffer()
+
+
 def ortho(width, height, x=0, y=0, flip_x=False, flip_y=False):
     """
     Return orthographic projection matrix
@@ -67,47 +199,23 @@ class BaseRect(object):
         return cls(x, y, x + width, y + height)
 
 
-@dataclass
-class Vec1:
-    x: float
-
-
-@dataclass
-class Vec2:
-    x: float
-    y: float
-
-
-@dataclass
-class Vec3:
-    x: float
-    y: float
-    z: float
-
-
-@dataclass
-class Vec4:
-    x: float
-    y: float
-    z: float
-    w: float
-
-
 class Triangles:
+    # note: vertex data has to be array of this format
+    FORMAT = POSITION_COLOR
+
     vertex_code = """
     #version 330 core
-
+    """ + FRAME_BLOCK + """
     // Input vertex data, different for all executions of this shader.
     layout(location = 0) in vec2 position;
     layout(location = 1) in vec4 color;
 
-    uniform mat4 model_view_projection;
     uniform float scale;
 
     out vec4 v_color;
 
     void main(){
-        gl_Position =  model_view_projection * vec4(position, 0, 1/scale);
+        gl_Position =  projection * vec4(position * scale, 0, 1);
         v_color = color;
     }
     """
@@ -123,63 +231,167 @@ class Triangles:
         }
     """
 
-    def __init__(self, data: np.array, fb_scale: float = 1.):
-        self._shader = ShaderProgram(self.vertex_code, self.fragment_code)
+    def __init__(
+            self,
+            data: np.array,
+            fb_scale: float = 1.,
+            streaming: bool = False,
+            segments: int = 1,
+    ):
+        """
+        :param data: array of vertices of :attr:`FORMAT` or (N, 6) float32
+            array of x, y, r, g, b, a
+        :param fb_scale: framebuffer scale of vertex positions
+        :param streaming: set to True if data is replaced on (almost) every
+            frame. Buffer storage is then orphaned or cycled instead of
+            being rewritten in place, so uploads do not stall on the GPU
+        :param segments: number of ring buffer segments used in streaming
+            mode (see :class:`gl2dl.buffers.StreamingBuffer`)
+        """
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
         self._fb_scale = fb_scale
 
-        self.vao = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.vao)
+        if streaming:
+            self._vertices = StreamingBuffer(segments)
+        else:
+            self._vertices = VertexBuffer(gl.GL_STATIC_DRAW)
 
-        self.vbo = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        self.vao = gl.glGenVertexArrays(1)
+        gl_state.bind_vertex_array(self.vao)
 
-        # set position
-        gl.glEnableVertexAttribArray(0)
-        gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 24, ctypes.c_void_p(0))
-        # set color
-        gl.glEnableVertexAttribArray(1)
-        gl.glVertexAttribPointer(1, 4, gl.GL_FLOAT, gl.GL_FALSE, 24, ctypes.c_void_p(8))
+        self.vbo = self._vertices.handle
+        self._vertices.bind()
+        self.FORMAT.setup()
 
         # unbind vbo
-        gl.glBindVertexArray(0)
+        gl_state.bind_vertex_array(0)
+
+        # note: index of first vertex of current data in the buffer
+        self._first = 0
         self.data = data
 
     @property
     def data(self):
-        return np.copy(self._data)
+        """ Read-only view of current vertex data (no copy is made)
+
+        Assigned arrays of vertex dtype or plain float32 arrays are adopted
+        without copying, so :meth:`update` writes into the assigned array.
+        Assign a copy to keep the original untouched.
+        """
+        view = self._data.view()
+        view.flags.writeable = False
+        return view
 
     @data.setter
     def data(self, value):
-        self._data = value
-        if len(self.data):
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
-            gl.glBufferData(gl.GL_ARRAY_BUFFER, self._data.nbytes, self._data, gl.GL_STATIC_DRAW)  # noqa
+        self._data = self._vertices_of(value)
+
+        if not len(self._data):
+            return
+
+        if isinstance(self._vertices, StreamingBuffer):
+            offset = self._vertices.write(self._data)
+            # note: offset is in bytes and vertices are FORMAT.stride apart
+            #       no matter what array itemsize is
+            self._first = offset // self.FORMAT.stride
+        else:
+            self._vertices.upload(self._data)
+
+    def _vertices_of(self, value):
+        """ Return value as contiguous (N,) array of :attr:`FORMAT` vertices
+
+        Accepts arrays of vertex dtype and plain float32 arrays with all
+        vertex fields in the last dimension, e.g. (N, 6) for POSITION_COLOR,
+        which are viewed as vertices without copying.
+        """
+        dtype = self.FORMAT.dtype
+        value = np.asarray(value)
+
+        if value.dtype == dtype:
+            return np.ascontiguousarray(value).reshape(-1)
+
+        floats = dtype.itemsize // np.dtype(np.float32).itemsize
+
+        if (
+            value.dtype != np.float32 or
+            value.ndim < 1 or value.shape[-1] != floats or
+            not value.flags.c_contiguous
+        ):
+            raise ValueError(
+                "Expected array of {} or C-contiguous float32 array with "
+                "last dimension {}, got {} array of shape {}".format(
+                    dtype, floats, value.dtype, value.shape
+                )
+            )
 
-    def draw(self, scale=1.):
-        with self._shader as active:
-            active['scale'] = scale
-            active['model_view_projection'] = ortho(
-                window.width * self._fb_scale,
-                window.height * self._fb_scale,
-                0, 0,
+        return value.view(dtype).reshape(-1)
+
+    def update(self, start, data):
+        """ Replace vertices starting at index ``start`` in place
+
+        Only the changed range is uploaded and storage is not reallocated.
+        Data must fit in current vertex data. Note that the array assigned
+        to :attr:`data` is adopted, so it is modified in place as well.
+
+        :param start: index of first vertex to replace
+        :param data: replacement vertices (same formats as :attr:`data`)
+        """
+        data = self._vertices_of(data)
+        stop = start + len(data)
+
+        if start < 0 or stop > len(self._data):
+            raise IndexError(
+                "Vertex range {}:{} out of bounds of {} vertices".format(
+                    start, stop, len(self._data)
+                )
             )
-            gl.glBindVertexArray(self.vao)
-            gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(self._data))
+
+        self._data[start:stop] = data
+        self._vertices.update(
+            self._first * self.FORMAT.stride + start * self._data.itemsize,
+            self._data[start:stop],
+        )
+
+    def draw(self, scale=1., camera=None):
+        if not len(self._data):
+            return
+
+        frame_uniforms.use(camera)
+
+        with self._shader as active:
+            # note: data is in framebuffer pixels while projection is in
+            #       window pixels
+            active['scale'] = scale / self._fb_scale
+            gl_state.bind_vertex_array(self.vao)
+            gl.glDrawArrays(gl.GL_TRIANGLES, self._first, len(self._data))
+
+        if isinstance(self._vertices, StreamingBuffer):
+            self._vertices.fence()
+
+    def delete(self):
+        """ Release GL objects and shader program of triangles """
+        self._vertices.delete()
+        gl.glDeleteVertexArrays(1, [self.vao])
+        gl_state.deleted_vertex_array(self.vao)
+
+        programs.release(self._shader)
 
 
 class Rect(BaseRect):
     # todo: convert to traingle base
     vertex_code = """
         #version 330 core
-
+        """ + FRAME_BLOCK + """
         // Input vertex data, different for all executions of this shader.
         layout(location = 0) in vec2 vertexPosition;
 
-        uniform mat4 model_view_projection;
+        uniform vec2 translation;
         uniform float scale;
 
         void main(){
-            gl_Position =  model_view_projection * vec4(vertexPosition, 0, 1/scale);
+            gl_Position =  projection * vec4(
+                vertexPosition * scale + translation, 0, 1
+            );
         }
     """
 
@@ -199,93 +411,450 @@ class Rect(BaseRect):
     def __init__(self, width, height, pivot=(0, 0)):
         super(Rect, self).__init__(width, height, pivot)
 
-        self._shader = ShaderProgram(self.vertex_code, self.fragment_code)
-
-        self.width = width
-        self.height = height
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
 
-        self._triangles = rect_triangles(
-            0, 0, width, height
-        ) - np.array(pivot, dtype=np.float32)
+        vertices = rects_quads([0, 0, width, height], pivot)
 
         self.VAO = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.VAO)
+        gl_state.bind_vertex_array(self.VAO)
 
         self.VBO = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, self._triangles.nbytes, self._triangles, gl.GL_STATIC_DRAW)  # noqa
-        gl.glEnableVertexAttribArray(0)
+        gl_state.bind_array_buffer(self.VBO)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STATIC_DRAW)  # noqa
+        POSITION.setup()
 
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-        gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+        quad_index_buffer.attach()
 
         # unbind VBO
-        gl.glBindVertexArray(0)
+        gl_state.bind_vertex_array(0)
+
+    def draw(self, x, y, color, scale=1., camera=None):
+        frame_uniforms.use(camera)
 
-    def draw(self, x, y, color, scale=1.):
         with self._shader as active:
-            active['model_view_projection'] = ortho(
-                window.width,
-                window.height,
-                x, y,
-            )
+            active['translation'] = x, y
             active['scale'] = scale
             active['color'] = color
 
-            # draw rect triangles
-            gl.glBindVertexArray(self.VAO)
-            gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(self._triangles))
+            # draw rect quad
+            gl_state.bind_vertex_array(self.VAO)
+            quad_index_buffer.draw(1)
 
+    def delete(self):
+        """ Release GL objects and shader program of rect """
+        gl.glDeleteBuffers(1, [self.VBO])
+        gl_state.deleted_array_buffer(self.VBO)
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
 
-class RectBatch(list):
+        programs.release(self._shader)
+
+
+class RectBatch(object):
     """ Special-case object for rendering multiple rectangles in single shader
     pass.
 
-    FIXME: maybe deque will be better representation
+    Rectangles are kept in contiguous numpy arrays of positions, sizes and
+    pivots and are addressed with stable integer handles returned by
+    :meth:`add`. Adding and removing rectangles is O(1) (removal moves the
+    last rectangle into the freed slot). Only slots changed since previous
+    draw are rebuilt (into CPU-side copy of vertex buffer) and uploaded to
+    the GPU with ``glBufferSubData``.
     """
     # reuse shader code from rect as it is completely the same
     vertex_code = Rect.vertex_code
     fragment_code = Rect.fragment_code
 
-    def __init__(self, *args, **kwargs):
-        super(RectBatch, self).__init__(*args, **kwargs)
-        self._shader = ShaderProgram(self.vertex_code, self.fragment_code)
+    # note: dirty runs separated by less slots than that are uploaded as one
+    #       range and if there are still too many ranges whole dirty span is
+    #       uploaded at once. Few bigger uploads beat lots of tiny ones.
+    MERGE_GAP = 64
+    MAX_UPLOADS = 16
+
+    # note: per-slot arrays that have to follow rectangle when it changes slot
+    _PER_SLOT = ('_positions', '_sizes', '_pivots')
+
+    def __init__(self, rects=(), capacity=64):
+        """
+        :param rects: iterable of ``(position, BaseRect)`` pairs
+        :param capacity: number of rectangles to allocate storage for
+        """
+        self._count = 0
+        self._positions = np.zeros((capacity, 2), dtype=np.float32)
+        self._sizes = np.zeros((capacity, 2), dtype=np.float32)
+        self._pivots = np.zeros((capacity, 2), dtype=np.float32)
+        self._dirty = np.zeros(capacity, dtype=bool)
+        self._geometry = self._allocate_geometry(capacity)
+
+        # note: slot -> handle and handle -> slot (-1 for removed handles)
+        self._handles = np.zeros(capacity, dtype=np.int64)
+        self._slots = np.full(capacity, -1, dtype=np.int64)
+        self._next_handle = 0
+
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
+
         self.VAO = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.VAO)
+        gl_state.bind_vertex_array(self.VAO)
 
-        self.VBO = gl.glGenBuffers(1)
-        gl.glEnableVertexAttribArray(0)
+        self._vertices = VertexBuffer()
+        self._setup_attributes()
 
-    def get_triangles(self):
-        # fixme: profile this
-        triangles = np.concatenate([
-            rect._triangles + np.array(position, dtype=np.float32)
-            for position, rect in self
-        ])
+        gl_state.bind_vertex_array(0)
 
-        return triangles
+        for rect in rects:
+            self.append(rect)
 
-    def draw(self, color=None):
-        # fixme: quadratic time performance, improve
-        triangles = self.get_triangles()
+    def _allocate_geometry(self, capacity):
+        """ Return CPU-side copy of vertex buffer data for ``capacity`` slots
+        """
+        return np.zeros((capacity, len(QUAD_CORNERS), 2), dtype=np.float32)
 
-        # fixme: no need to send buffer data every time batch is drawn
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, triangles.nbytes, triangles, gl.GL_STATIC_DRAW)  # noqa
+    def _setup_attributes(self):
+        self._vertices.bind()
+        POSITION.setup()
 
-        gl.glBindVertexArray(self.VAO)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.VBO)
-        gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+        quad_index_buffer.attach()
 
-        with self._shader as active:
-            active['model_view_projection'] = ortho(
-                window.width,
-                window.height,
-                0, 0,
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, handle):
+        return 0 <= handle < self._next_handle and self._slots[handle] >= 0
+
+    @property
+    def handles(self):
+        """ Read-only view of handles of all rectangles in slot order """
+        return self._readonly(self._handles)
+
+    @property
+    def positions(self):
+        """ Read-only view of positions of all rectangles in slot order """
+        return self._readonly(self._positions)
+
+    def _readonly(self, array):
+        view = array[:self._count]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, count):
+        """ Make room for ``count`` more rectangles and handles """
+        needed = self._count + count
+        if needed > len(self._positions):
+            self._grow(max(needed, 2 * len(self._positions)))
+
+        needed = self._next_handle + count
+        if needed > len(self._slots):
+            self._slots = np.concatenate((self._slots, np.full(
+                max(needed, 2 * len(self._slots)) - len(self._slots),
+                -1, dtype=np.int64
+            )))
+
+    def add(self, position, size, pivot=(0, 0)):
+        """ Add rectangle to the batch
+
+        :return: handle of the rectangle
+        """
+        self._reserve(1)
+        slot, handle = self._count, self._next_handle
+
+        self._positions[slot] = position
+        self._sizes[slot] = size
+        self._pivots[slot] = pivot
+        self._dirty[slot] = True
+
+        self._handles[slot] = handle
+        self._slots[handle] = slot
+
+        self._count += 1
+        self._next_handle += 1
+
+        return handle
+
+    def add_many(self, positions, sizes, pivots=(0, 0)):
+        """ Vectorized :meth:`add` for (N, 2) arrays of positions and sizes
+
+        :return: array of handles of added rectangles
+        """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        count = len(positions)
+        self._reserve(count)
+
+        slots = np.arange(self._count, self._count + count)
+        handles = np.arange(self._next_handle, self._next_handle + count)
+
+        self._positions[slots] = positions
+        self._sizes[slots] = sizes
+        self._pivots[slots] = pivots
+        self._dirty[slots] = True
+
+        self._handles[slots] = handles
+        self._slots[handles] = slots
+
+        self._count += count
+        self._next_handle += count
+
+        return handles
+
+    def append(self, item):
+        """ Add ``(position, BaseRect)`` pair to the batch
+
+        :return: handle of the rectangle
+        """
+        position, rect = item
+        return self.add(position, (rect.width, rect.height), rect.pivot)
+
+    def remove(self, handle):
+        slot = self._slot(handle)
+        last = self._count - 1
+
+        if slot != last:
+            for name in self._PER_SLOT:
+                array = getattr(self, name)
+                array[slot] = array[last]
+
+            moved = self._handles[last]
+            self._handles[slot] = moved
+            self._slots[moved] = slot
+            self._dirty[slot] = True
+
+        self._slots[handle] = -1
+        self._dirty[last] = False
+        self._count = last
+
+    def move(self, handle, position):
+        slot = self._slot(handle)
+
+        self._positions[slot] = position
+        self._dirty[slot] = True
+
+    def move_many(self, handles, positions):
+        """ Vectorized :meth:`move` for arrays of handles and positions """
+        handles = np.asarray(handles)
+
+        if (
+            handles.size and
+            (handles.min() < 0 or handles.max() >= self._next_handle)
+        ):
+            raise KeyError("Unknown rect handle")
+
+        slots = self._slots[handles]
+
+        if (slots < 0).any():
+            raise KeyError("Unknown rect handle")
+
+        self._positions[slots] = positions
+        self._dirty[slots] = True
+
+    def _slot(self, handle):
+        if handle not in self:
+            raise KeyError("Unknown rect handle: {}".format(handle))
+
+        return self._slots[handle]
+
+    def _grow(self, capacity):
+        for name in self._PER_SLOT + ('_dirty', '_handles', '_geometry'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _corners(self, slots, corners):
+        """ Return (n, len(corners), 2) array of vertices of given slots """
+        x1, y1 = (self._positions[slots] - self._pivots[slots]).T
+        width, height = self._sizes[slots].T
+
+        return corner_vertices(x1, y1, x1 + width, y1 + height, corners)
+
+    def _build(self, slots):
+        """ Return vertex buffer data of given slots """
+        return self._corners(slots, QUAD_CORNERS)
+
+    def get_triangles(self):
+        return self._corners(
+            slice(0, self._count), RECT_TRIANGLE_CORNERS
+        ).reshape(-1, 2)
+
+    def _sync(self):
+        dirty = np.flatnonzero(self._dirty[:self._count])
+        if not len(dirty):
+            return
+
+        self._dirty[:] = False
+        self._geometry[dirty] = self._build(dirty)
+        rect_bytes = self._geometry[:1].nbytes
+
+        if self._vertices.reserve(len(self._geometry) * rect_bytes):
+            # note: storage was reallocated so everything has to be uploaded
+            starts, stops = [0], [self._count]
+
+        else:
+            breaks = np.flatnonzero(np.diff(dirty) > self.MERGE_GAP)
+            starts = np.concatenate((dirty[:1], dirty[breaks + 1]))
+            stops = np.concatenate((dirty[breaks], dirty[-1:])) + 1
+
+            if len(starts) > self.MAX_UPLOADS:
+                starts, stops = starts[:1], stops[-1:]
+
+        for start, stop in zip(starts, stops):
+            self._vertices.update(
+                int(start) * rect_bytes, self._geometry[start:stop]
             )
 
+    def draw(self, color=None, camera=None):
+        self._sync()
+
+        if not self._count:
+            return
+
+        frame_uniforms.use(camera)
+        quad_index_buffer.reserve(self._count)
+
+        with self._shader as active:
+            active['translation'] = 0, 0
             active['scale'] = 1.
             active['color'] = color or [1, 1, 1, 1]
 
-            # draw rect triangles
-            gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(triangles))
+            # draw rect quads
+            gl_state.bind_vertex_array(self.VAO)
+            quad_index_buffer.draw(self._count)
+
+    def delete(self):
+        """ Release GL objects and shader program of the batch """
+        self._vertices.delete()
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
+
+        programs.release(self._shader)
+
+
+class InstancedRectBatch(RectBatch):
+    """ Rectangle batch rendered with instancing.
+
+    GPU keeps single unit quad and every rectangle is one instance described
+    by its position, size, pivot and color, so each rectangle of the batch
+    can have its own color. Whole batch is drawn with single
+    ``glDrawElementsInstanced`` call and uploads 40 bytes per changed
+    rectangle instead of four vertices.
+    """
+    vertex_code = """
+        #version 330 core
+        """ + FRAME_BLOCK + """
+        // unit quad shared by all instances
+        layout(location = 0) in vec2 corner;
+
+        // per-instance attributes
+        layout(location = 1) in vec2 position;
+        layout(location = 2) in vec2 size;
+        layout(location = 3) in vec2 pivot;
+        layout(location = 4) in vec4 color;
+
+        out vec4 v_color;
+
+        void main(){
+            gl_Position = projection * vec4(
+                corner * size - pivot + position, 0, 1
+            );
+            v_color = color;
+        }
+    """
+
+    fragment_code = """
+        #version 330 core
+        uniform vec4 tint;
+
+        in vec4 v_color;
+
+        out lowp vec4 out_color;
+
+        void main(){
+            out_color = v_color * tint;
+        }
+    """
+
+    INSTANCE_DTYPE = np.dtype([
+        ('position', np.float32, 2),
+        ('size', np.float32, 2),
+        ('pivot', np.float32, 2),
+        ('color', np.float32, 4),
+    ])
+    INSTANCE_FORMAT = VertexFormat(INSTANCE_DTYPE, first_location=1, divisor=1)
+
+    _PER_SLOT = RectBatch._PER_SLOT + ('_colors',)
+
+    def __init__(self, rects=(), capacity=64):
+        self._colors = np.ones((capacity, 4), dtype=np.float32)
+        super(InstancedRectBatch, self).__init__(rects, capacity)
+
+    def _allocate_geometry(self, capacity):
+        return np.zeros(capacity, dtype=self.INSTANCE_DTYPE)
+
+    def _setup_attributes(self):
+        self._quad = VertexBuffer(gl.GL_STATIC_DRAW)
+        self._quad.upload(rects_quads([0, 0, 1, 1]))
+        POSITION.setup()
+        quad_index_buffer.attach()
+
+        self._vertices.bind()
+        self.INSTANCE_FORMAT.setup()
+
+    def add(self, position, size, pivot=(0, 0), color=(1, 1, 1, 1)):
+        """ Add rectangle to the batch
+
+        :param color: RGBA color of the rectangle
+        :return: handle of the rectangle
+        """
+        handle = super(InstancedRectBatch, self).add(position, size, pivot)
+        self._colors[self._slots[handle]] = color
+
+        return handle
+
+    def add_many(self, positions, sizes, pivots=(0, 0), colors=(1, 1, 1, 1)):
+        """ Vectorized :meth:`add`
+
+        :param colors: (N, 4) array of colors or single color for all
+        :return: array of handles of added rectangles
+        """
+        handles = super(InstancedRectBatch, self).add_many(
+            positions, sizes, pivots
+        )
+        self._colors[self._slots[handles]] = colors
+
+        return handles
+
+    def recolor(self, handle, color):
+        slot = self._slot(handle)
+
+        self._colors[slot] = color
+        self._dirty[slot] = True
+
+    def _build(self, slots):
+        instances = np.empty(len(slots), dtype=self.INSTANCE_DTYPE)
+
+        instances['position'] = self._positions[slots]
+        instances['size'] = self._sizes[slots]
+        instances['pivot'] = self._pivots[slots]
+        instances['color'] = self._colors[slots]
+
+        return instances
+
+    def draw(self, color=None, camera=None):
+        """
+        :param color: optional tint multiplied with colors of all rectangles
+        :param camera: optional camera, frame camera is used if not set
+        """
+        self._sync()
+
+        if not self._count:
+            return
+
+        frame_uniforms.use(camera)
+
+        with self._shader as active:
+            active['tint'] = color or [1, 1, 1, 1]
+
+            gl_state.bind_vertex_array(self.VAO)
+            quad_index_buffer.draw(1, instances=self._count)
+
+    def delete(self):
+        self._quad.delete()
+        super(InstancedRectBatch, self).delete()
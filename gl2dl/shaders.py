@@ -1,8 +1,22 @@
 # -*- coding: utf-8 -*-
-from functools import wraps
+from functools import partial, wraps
+import ctypes
+import hashlib
+import os
 import re
+import struct
 
 import OpenGL.GL as gl
+from OpenGL.GL.KHR import parallel_shader_compile as khr_parallel
+import numpy as np
+
+from .state import gl_state
+
+
+# binding points of uniform blocks shared between programs
+UNIFORM_BLOCK_BINDINGS = {
+    'Frame': 0,
+}
 
 
 def _(fun):
@@ -23,6 +37,7 @@ class ShaderCompilationError(RuntimeError):
     SHADER_ERR_RES = [
         re.compile(r'ERROR: (?P<file_num>\d+):(?P<line_num>\d+)'),
         re.compile(r'(?P<file_num>\d+)\((?P<line_num>\d+)\) : error'),
+        re.compile(r'(?P<file_num>\d+):(?P<line_num>\d+)\(\d+\): error'),
     ]
 
     def __init__(self, gl_msg, code):
@@ -68,6 +83,98 @@ def unpack_ctypes(value):
     return list(value) if hasattr(value, '__getitem__') else value
 
 
+def _snapshot(value):
+    """ Return copy of uniform value that is safe to compare against later
+
+    Scalars are immutable so they are stored as they are. Everything else
+    (sequences, numpy arrays) is copied into new array because caller may
+    still mutate the original object in place.
+    """
+    if isinstance(value, (int, float)):
+        return value
+
+    return np.array(value)
+
+
+def _same(snapshot, value):
+    if isinstance(snapshot, np.ndarray):
+        return np.array_equal(snapshot, value)
+
+    return snapshot == value
+
+
+class Uniform(object):
+    """ Handle to a single active uniform of a linked shader program.
+
+    Location, element count and GL setter are resolved once at link time so
+    writing a value through the handle is a single GL call. Program has to
+    be bound when value is set.
+
+    Handle keeps CPU-side copy of the last value it has written so writes
+    that do not change anything issue no GL call at all and reads never
+    need to query the driver. Values written behind handle's back (e.g. with
+    raw ``glUniform*`` calls) require :meth:`invalidate`.
+    """
+    __slots__ = (
+        'name', 'location', 'size', 'gl_type',
+        '_program', '_set', '_getter', '_ctype', '_value',
+    )
+
+    def __init__(self, program, name, location, size, gl_type):
+        self.name = name
+        self.location = location
+        self.size = size
+        self.gl_type = gl_type
+
+        setter, getter, ctype = ShaderProgram.TYPE_CONST_TO_SET_GET_TYPE[
+            gl_type
+        ]
+
+        self._program = program
+        self._set = partial(setter, location, size)
+        self._getter = getter
+        self._ctype = ctype
+        self._value = None
+
+    def set(self, value):
+        if self._value is not None and _same(self._value, value):
+            return
+
+        self._set(value)
+        self._value = _snapshot(value)
+
+    def get(self):
+        if self._value is None:
+            # note: only first read of never written uniform reaches the
+            #       driver, afterwards value is answered from the mirror
+            self._value = _snapshot(self._read())
+
+        if isinstance(self._value, np.ndarray):
+            return self._value.tolist()
+
+        return self._value
+
+    def invalidate(self):
+        """ Forget mirrored value so next write always reaches the driver """
+        self._value = None
+
+    def _read(self):
+        result = (self._ctype * self.size)()
+        self._getter(self._program, self.location, result)
+
+        # Bacause we have same code/interface for dealing with arrays
+        # and single-value uniforms do some unpacking so dynamically
+        # typed minds won't be surprised
+        return list(
+            unpack_ctypes(elem) for elem in result
+        ) if self.size > 1 else unpack_ctypes(result[0])
+
+    value = property(get, set)
+
+    def __repr__(self):
+        return "<Uniform {} at {}>".format(self.name, self.location)
+
+
 class ShaderProgram(object):
     """
     """
@@ -103,7 +210,7 @@ class ShaderProgram(object):
         gl.GL_FLOAT_MAT4: (_(gl.glUniformMatrix4fv), gl.glGetUniformfv, gl.GLfloat * 16),  # noqa
 
         gl.GL_FLOAT_MAT2x3: (_(gl.glUniformMatrix2x3fv), gl.glGetUniformfv, gl.GLfloat * 6),  # noqa
-        gl.GL_FLOAT_MAT2x4: (_(gl.glUniformMatrix2x3fv), gl.glGetUniformfv, gl.GLfloat * 8),  # noqa
+        gl.GL_FLOAT_MAT2x4: (_(gl.glUniformMatrix2x4fv), gl.glGetUniformfv, gl.GLfloat * 8),  # noqa
 
         gl.GL_FLOAT_MAT3x2: (_(gl.glUniformMatrix3x2fv), gl.glGetUniformfv, gl.GLfloat * 6),  # noqa
         gl.GL_FLOAT_MAT3x4: (_(gl.glUniformMatrix3x4fv), gl.glGetUniformfv, gl.GLfloat * 12),  # noqa
@@ -114,10 +221,12 @@ class ShaderProgram(object):
         gl.GL_SAMPLER_1D: (gl.glUniform1iv, gl.glGetUniformiv, gl.GLuint),
         gl.GL_SAMPLER_2D: (gl.glUniform1iv, gl.glGetUniformiv, gl.GLuint),
         gl.GL_SAMPLER_3D: (gl.glUniform1iv, gl.glGetUniformiv, gl.GLuint),
+        gl.GL_SAMPLER_2D_ARRAY: (gl.glUniform1iv, gl.glGetUniformiv, gl.GLuint),  # noqa
     }
 
     def __init__(
-        self, vertex_code, fragment_code, geometry_code=None
+        self, vertex_code, fragment_code, geometry_code=None,
+        binary_cache=None, deferred=False,
     ):
         """
         TODO: way to ensure (at least with __debug__) that shader is bound when
@@ -125,57 +234,171 @@ class ShaderProgram(object):
         :param vertex_code:
         :param fragment_code:
         :param geometry_code:
+        :param binary_cache: optional :class:`ProgramBinaryCache` instance.
+            If set, program is loaded from cached binary when possible and
+            compiled program binary is stored in cache otherwise.
+        :param deferred: if True only submit compilation and linking to the
+            driver and check their results (and raise errors) on first
+            bind. This lets driver compile many programs concurrently
+            instead of waiting for every program right after it is linked.
         :return:
         """
-        self.vertex = self._create_shader(vertex_code, self.VERTEX)
-        self.fragment = self._create_shader(fragment_code, self.FRAGMENT)
+        self.key = source_key(vertex_code, fragment_code, geometry_code)
 
-        if geometry_code:
-            self.geometry = self._create_shader(geometry_code, self.GEOMETRY)
-        else:
-            self.geometry = None
+        self.vertex = self.fragment = self.geometry = None
+        self.handle = binary_cache.load(self.key) if binary_cache else None
+
+        self._binary_cache = binary_cache
+        self._pending = None
+        # note: compilation or link error of deferred program
+        self._error = None
+        self._uniforms = {}
+
+        if self.handle is None:
+            if deferred:
+                enable_parallel_compilation()
+
+            self.vertex = self._create_shader(
+                vertex_code, self.VERTEX, deferred
+            )
+            self.fragment = self._create_shader(
+                fragment_code, self.FRAGMENT, deferred
+            )
+
+            if geometry_code:
+                self.geometry = self._create_shader(
+                    geometry_code, self.GEOMETRY, deferred
+                )
+
+            self.handle = self._link_shader_program(
+                self.vertex, self.fragment, self.geometry,
+                retrievable=binary_cache is not None,
+                deferred=deferred,
+            )
+
+            if deferred:
+                self._pending = (
+                    (self.vertex, vertex_code),
+                    (self.fragment, fragment_code),
+                    (self.geometry, geometry_code),
+                )
+                return
+
+            if binary_cache:
+                binary_cache.store(self.key, self.handle)
 
-        self.handle = self._link_shader_program(
-            self.vertex, self.fragment, self.geometry
+        self._prepare_uniform_blocks()
+        self._uniforms = self._prepare_uniforms()
+
+    @property
+    def pending(self):
+        """ True if deferred compilation results were not checked yet """
+        return self._pending is not None
+
+    def is_ready(self):
+        """ Return True if program can be bound without waiting for driver
+
+        Without ``KHR_parallel_shader_compile`` there is no way to ask
+        driver without blocking so pending program is never reported ready.
+        """
+        if self._pending is None:
+            return True
+
+        if not enable_parallel_compilation():
+            return False
+
+        completed = gl.GLint()
+        gl.glGetProgramiv(
+            self.handle, khr_parallel.GL_COMPLETION_STATUS_KHR, completed
         )
+        return bool(completed.value)
+
+    def finish(self):
+        """ Wait for deferred compilation and check its results
+
+        :raises ShaderCompilationError: if any of shaders failed to compile
+        :raises RuntimeError: if program failed to link
+        """
+        if self._error is not None:
+            raise self._error
 
+        if self._pending is None:
+            return
+
+        shaders, self._pending = self._pending, None
+
+        try:
+            # note: compilation errors are checked first because they are
+            #       far more informative than link error of the same failure
+            for shader, code in shaders:
+                if shader:
+                    self._check_shader(shader, code)
+
+            self._check_program(
+                self.handle, self.vertex, self.fragment, self.geometry
+            )
+        except Exception as error:
+            # note: program that failed is never usable so every later bind
+            #       raises the same error instead of opaque GL error
+            self._error = error
+            raise
+
+        if self._binary_cache:
+            self._binary_cache.store(self.key, self.handle)
+
+        self._prepare_uniform_blocks()
         self._uniforms = self._prepare_uniforms()
 
     def __setitem__(self, key, value):
-        # compat: py3 version requires bytes
-        key = key.encode('utf-8')
-        if key in self._uniforms:
-            size, gl_type = self._uniforms[key]
+        # note: no need to finish() here because uniforms can be set only
+        #       on bound programs
+        self._uniform(key).set(value)
 
-            location = gl.glGetUniformLocation(self.handle, key)
-            setter, getter, __ = self.TYPE_CONST_TO_SET_GET_TYPE[gl_type]
+    def __getitem__(self, key):
+        self.finish()
+        return self._uniform(key).get()
 
-            setter(location, size, value)
+    def _uniform(self, key):
+        # note: errors raised by Uniform.set/get must not be reported as
+        #       missing uniforms so lookup is done separately
+        uniform = self._uniforms.get(key)
 
-        else:
+        if uniform is None:
             raise KeyError("No active uniform of name: {}".format(key))
 
-    def __getitem__(self, key):
-        # compat: py3 version requires bytes
-        key = key.encode('utf-8')
-        if key in self._uniforms:
-            size, gl_type = self._uniforms[key]
-            setter, getter, GLType = self.TYPE_CONST_TO_SET_GET_TYPE[gl_type]
-
-            location = gl.glGetUniformLocation(self.handle, key)
-            result = (GLType * size)()
-            getter(self.handle, location, result)
-
-            # Bacause we have same code/interface for dealing with arrays
-            # and single-value uniforms do some unpacking so dynamically
-            # typed minds won't be surprised
-            return list(
-                unpack_ctypes(elem) for elem in result
-            ) if size > 1 else unpack_ctypes(result[0])
+        return uniform
 
-        else:
+    def __contains__(self, key):
+        self.finish()
+        return key in self._uniforms
+
+    def uniform(self, key):
+        """ Return :class:`Uniform` handle for given active uniform name
+
+        Handles are resolved once at link time so keeping a reference to them
+        avoids even the dictionary lookup of ``program[key] = value``.
+        """
+        self.finish()
+
+        try:
+            return self._uniforms[key]
+        except KeyError:
             raise KeyError("No active uniform of name: {}".format(key))
 
+    def invalidate_uniforms(self):
+        """ Forget all mirrored uniform values of this program """
+        for uniform in self._uniforms.values():
+            uniform.invalidate()
+
+    def _prepare_uniform_blocks(self):
+        """ Bind shared uniform blocks used by program to their binding points
+        """
+        for name, binding in UNIFORM_BLOCK_BINDINGS.items():
+            index = gl.glGetUniformBlockIndex(self.handle, name)
+
+            if index != gl.GL_INVALID_INDEX:
+                gl.glUniformBlockBinding(self.handle, index, binding)
+
     def _prepare_uniforms(self):
         uniforms = {}
 
@@ -187,37 +410,66 @@ class ShaderProgram(object):
                 self.handle,
                 uniform_index,
             )
+            # compat: py3 version returns bytes
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+
             # we know we are dealing with array and returned name will have
             # '[0]' at the end that we don't want to have in uniforms dict
-            if size > 1 and '[0]' in name:
+            if size > 1 and name.endswith('[0]'):
                 name = name[:-3]
 
-            uniforms[name] = size, gl_type
+            location = gl.glGetUniformLocation(self.handle, name)
+            # note: uniforms of types we do not know how to set (and uniforms
+            #       from named blocks that have no location) are not exposed
+            if location < 0 or gl_type not in self.TYPE_CONST_TO_SET_GET_TYPE:
+                continue
+
+            uniforms[name] = Uniform(
+                self.handle, name, location, size, gl_type
+            )
 
         return uniforms
 
     @staticmethod
-    def _create_shader(code, shader_type):
+    def _create_shader(code, shader_type, deferred=False):
         shader = gl.glCreateShader(shader_type)
         gl.glShaderSource(shader, code)
         gl.glCompileShader(shader)
 
-        if not gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS):
-            raise ShaderCompilationError(gl.glGetShaderInfoLog(shader), code)
+        if not deferred:
+            ShaderProgram._check_shader(shader, code)
 
         return shader
 
     @staticmethod
-    def _link_shader_program(*shaders):
+    def _check_shader(shader, code):
+        if not gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS):
+            raise ShaderCompilationError(gl.glGetShaderInfoLog(shader), code)
+
+    @staticmethod
+    def _link_shader_program(*shaders, retrievable=False, deferred=False):
 
         program = gl.glCreateProgram()
 
+        if retrievable:
+            gl.glProgramParameteri(
+                program, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE
+            )
+
         for shader in shaders:
             if shader:
                 gl.glAttachShader(program, shader)
 
         gl.glLinkProgram(program)
 
+        if not deferred:
+            ShaderProgram._check_program(program, *shaders)
+
+        return program
+
+    @staticmethod
+    def _check_program(program, *shaders):
         if not gl.glGetProgramiv(program, gl.GL_LINK_STATUS):
             raise RuntimeError(gl.glGetProgramInfoLog(program))
 
@@ -225,14 +477,24 @@ class ShaderProgram(object):
             if shader:
                 gl.glDetachShader(program, shader)
 
-        return program
+    def delete(self):
+        """ Release GL program and shader objects """
+        for shader in (self.vertex, self.fragment, self.geometry):
+            if shader:
+                gl.glDeleteShader(shader)
+
+        gl.glDeleteProgram(self.handle)
+        gl_state.deleted_program(self.handle)
 
     def bind(self):
-        gl.glUseProgram(self.handle)
+        if self._pending is not None or self._error is not None:
+            self.finish()
+
+        gl_state.use_program(self.handle)
 
     @staticmethod
     def unbind():
-        gl.glUseProgram(0)
+        gl_state.use_program(0)
 
     # context manager protocol
     def __enter__(self):
@@ -241,4 +503,219 @@ class ShaderProgram(object):
 
     # context manager protocol
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.unbind()
+        # note: program is intentionally left bound, next draw will most
+        #       likely use the same program and gl_state elides the rebind
+        pass
+
+
+_parallel_compilation = []
+
+
+def enable_parallel_compilation():
+    """ Let driver use as many compiler threads as it wants
+
+    Uses ``KHR_parallel_shader_compile`` and must be called with current
+    GL context.
+
+    :return: True if extension is supported
+    """
+    if not _parallel_compilation:
+        supported = bool(khr_parallel.glInitParallelShaderCompileKHR())
+
+        if supported:
+            # note: 0xFFFFFFFF means implementation-specific maximum
+            khr_parallel.glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+
+        _parallel_compilation.append(supported)
+
+    return _parallel_compilation[0]
+
+
+def source_key(vertex_code, fragment_code, geometry_code=None):
+    """ Return digest that identifies program built from given sources """
+    digest = hashlib.sha1()
+
+    for code in (vertex_code, fragment_code, geometry_code or ''):
+        digest.update(code.encode('utf-8'))
+        # note: separator so moving code between stages changes the key
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+class ProgramBinaryCache(object):
+    """ Persistent on-disk cache of linked program binaries.
+
+    Binaries are only valid for the driver that produced them so every entry
+    is keyed by program sources and by GL vendor, renderer and version
+    strings. Driver may still reject binary (e.g. after update that did not
+    change version string) and then program is compiled from sources again
+    and cache entry is overwritten.
+
+    Requires GL 4.1 or ``ARB_get_program_binary``. When it is not available
+    cache silently does nothing.
+    """
+    HEADER = struct.Struct('<I')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._driver = None
+
+    @staticmethod
+    def is_supported():
+        return bool(gl.glGetProgramBinary) and bool(
+            gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS)
+        )
+
+    def path(self, key):
+        if self._driver is None:
+            self._driver = b'\0'.join(
+                gl.glGetString(name) or b'' for name in
+                (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION)
+            )
+
+        digest = hashlib.sha1(key.encode('utf-8'))
+        digest.update(self._driver)
+
+        return os.path.join(self.directory, digest.hexdigest() + '.bin')
+
+    def load(self, key):
+        """ Return linked program handle created from cached binary
+
+        :return: program handle or None if there is no usable cache entry
+        """
+        if not self.is_supported():
+            return None
+
+        try:
+            with open(self.path(key), 'rb') as cached:
+                data = cached.read()
+        except OSError:
+            return None
+
+        if len(data) <= self.HEADER.size:
+            return None
+
+        binary_format, = self.HEADER.unpack_from(data)
+        binary = data[self.HEADER.size:]
+
+        program = gl.glCreateProgram()
+
+        try:
+            gl.glProgramBinary(program, binary_format, binary, len(binary))
+        except gl.GLError:
+            # note: driver does not know this binary format anymore
+            linked = False
+        else:
+            linked = gl.glGetProgramiv(program, gl.GL_LINK_STATUS)
+
+        if not linked:
+            gl.glDeleteProgram(program)
+            return None
+
+        return program
+
+    def store(self, key, program):
+        if not self.is_supported():
+            return
+
+        length = gl.glGetProgramiv(program, gl.GL_PROGRAM_BINARY_LENGTH)
+        if not length:
+            return
+
+        written = gl.GLsizei()
+        binary_format = gl.GLenum()
+        binary = (ctypes.c_ubyte * length)()
+        gl.glGetProgramBinary(
+            program, length, written, binary_format, binary
+        )
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+
+        # note: write to temporary file first so concurrently starting
+        #       processes never read half-written entry
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as cached:
+            cached.write(self.HEADER.pack(binary_format.value))
+            cached.write(bytes(binary)[:written.value])
+
+        os.replace(temporary, path)
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+
+        for name in os.listdir(self.directory):
+            if name.endswith('.bin'):
+                os.remove(os.path.join(self.directory, name))
+
+
+class ProgramRegistry(object):
+    """ Process-wide registry of shared, reference counted shader programs.
+
+    Drawables of the same class use identical shader sources so there is no
+    need to compile and link them for every instance. Registry hands out one
+    :class:`ShaderProgram` per unique set of sources. Because program is
+    shared, drawables must not rely on uniform values set outside of their
+    draw calls and have to write their per-instance uniforms every time they
+    are drawn (uniform mirror makes repeated writes of same value cheap).
+
+    Setting :attr:`binary_cache` to :class:`ProgramBinaryCache` instance
+    enables persistent program binary cache for all programs created by
+    registry afterwards. Setting :attr:`deferred` to True makes registry
+    create programs with deferred compilation (see :class:`ShaderProgram`)
+    so e.g. loading whole level only submits programs to the driver.
+    """
+    PROGRAM_CLASS = ShaderProgram
+
+    def __init__(self, binary_cache=None, deferred=False):
+        self.binary_cache = binary_cache
+        self.deferred = deferred
+
+        self._programs = {}
+        self._references = {}
+
+    def acquire(self, vertex_code, fragment_code, geometry_code=None):
+        """ Return shared program for given sources and increase its refcount
+
+        Program is compiled and linked only on first acquisition.
+        """
+        key = source_key(vertex_code, fragment_code, geometry_code)
+
+        if key not in self._programs:
+            self._programs[key] = self.PROGRAM_CLASS(
+                vertex_code, fragment_code, geometry_code,
+                binary_cache=self.binary_cache,
+                deferred=self.deferred,
+            )
+            self._references[key] = 0
+
+        self._references[key] += 1
+        return self._programs[key]
+
+    def release(self, program):
+        """ Decrease refcount of program and delete it when no longer used """
+        key = program.key
+        self._references[key] -= 1
+
+        if not self._references[key]:
+            del self._references[key]
+            self._programs.pop(key).delete()
+
+    def finish(self):
+        """ Wait for all pending programs and check their compilation """
+        for program in self._programs.values():
+            program.finish()
+
+    def references(self, program):
+        return self._references.get(program.key, 0)
+
+    def __len__(self):
+        return len(self._programs)
+
+    def __contains__(self, program):
+        return self._programs.get(program.key) is program
+
+
+programs = ProgramRegistry()
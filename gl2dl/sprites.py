@@ -1,63 +1,36 @@
 # -*- coding: utf-8 -*-
 import OpenGL.GL as gl
 
-from PIL import Image
 import numpy as np
 
-from .primitives import ortho, rect_triangles
-from .shaders import ShaderProgram
-from .app import window
-
-
-class Texture(object):
-    def __init__(self, file_name, mode="RGBA"):
-        # todo: consider refactoring because it maybe can be moved somwhere
-        # todo: else
-        self.file_name = file_name
-
-        self._image = Image.open(file_name)
-        # note: different mode will require different argument in glTexImage2D
-        image_bytes = self._image.convert(mode).tobytes("raw", mode, 0, -1)
-
-        # GL texture object initialization
-        # todo: consolidate contract, consider inheriting from int or GLuint
-        # todo: and maybe using __new__ to create new "ints" objects
-        # todo: see OpenGL.GL.shaders.ShaderProgram for reference
-        # todo: consider storing that as texture_id
-        self.texture = gl.glGenTextures(1)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
-        # note: check what it does!
-        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
-        # pass image data as pixels
-        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, self.width, self.height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, image_bytes)  # noqa
-        gl.glTexParameter(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)  # noqa
-        gl.glTexParameter(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)  # noqa
-
-    @property
-    def width(self):
-        return self._image.size[0]
-
-    @property
-    def height(self):
-        return self._image.size[1]
+from .batches import InstancedQuadBatch
+from .primitives import quad_index_buffer, rects_quads
+from .shaders import programs
+from .state import gl_state
+from .textures import Texture, TextureArray, textures
+from .uniforms import FRAME_BLOCK, frame_uniforms
+from .vertices import VEC2, VertexFormat
 
 
 class Sprite(object):
     vertex_code = """
         #version 330 core
-
+        """ + FRAME_BLOCK + """
         // Input vertex data, different for all executions of this shader.
         layout(location = 0) in vec2 vertexPosition;
         layout(location = 1) in vec2 vertexUV;
 
-        uniform float scale;
-        uniform mat4 model_view_projection;
+        // note: scale is negative on flipped axes
+        uniform vec2 scale;
+        uniform vec2 translation;
 
         // Output data ; will be interpolated for each fragment.
         out vec2 UV;
 
         void main(){
-            gl_Position =  model_view_projection * vec4(vertexPosition, 0, 1/scale);
+            gl_Position =  projection * vec4(
+                vertexPosition * scale + translation, 0, 1
+            );
 
             // UV of the vertex. No special space for this one.
             UV = vertexUV;
@@ -84,11 +57,17 @@ class Sprite(object):
     """
     TEXTURE_CLASS = Texture
 
-    def __init__(self, file_name=None, texture=None, pivot=(0, 0)):
+    def __init__(
+            self, file_name=None, texture=None, pivot=(0, 0),
+            asynchronous=False,
+    ):
         """
         :param texture: Image object
         :param file_name: file_name object
         :param pivot: sprite pivot (x, y) in texture space for scaling and rotation
+        :param asynchronous: decode file in background, sprite is drawn
+            transparent until pixels are uploaded (see
+            :class:`gl2dl.textures.TextureLoader`)
         :return:
         """
         if texture and file_name:
@@ -97,72 +76,100 @@ class Sprite(object):
                 "'file_name' param but not both!"
             )
 
+        # note: textures loaded from files are shared through texture cache
+        #       and have to be released on delete
+        self._owns_texture = bool(file_name)
+        self.asynchronous = asynchronous
+
         if file_name:
             self._texture = self._setup_texture(file_name)
         else:
             self._texture = texture
 
         self.pivot = pivot
-        self._shader = ShaderProgram(self.vertex_code, self.fragment_code)
+        self._shader = programs.acquire(self.vertex_code, self.fragment_code)
 
         # each sprite has it's own VAO
         self.VAO = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self.VAO)
+        gl_state.bind_vertex_array(self.VAO)
 
         # two generic vertex attribute arrays - one for VBO and one for UVB
-        gl.glEnableVertexAttribArray(0)
         self.VBO = self._setup_vbo(0)
-
-        gl.glEnableVertexAttribArray(1)
         self.UVB = self._setup_uvb(1)
 
+        quad_index_buffer.attach()
+
         # finally unbind VBO
-        gl.glBindVertexArray(0)
+        gl_state.bind_vertex_array(0)
 
     def _setup_texture(self, file_name):
-        return self.TEXTURE_CLASS(file_name)
+        return textures.acquire(
+            file_name,
+            texture_class=self.TEXTURE_CLASS,
+            asynchronous=self.asynchronous,
+        )
 
     def _setup_vbo(self, attribute_index):
-        vertices = rect_triangles(
-            0, 0, self._texture.width, self._texture.height
-        ) - np.array(self.pivot, dtype=np.float32)
+        vertices = rects_quads(
+            [0, 0, self._texture.width, self._texture.height], self.pivot
+        )
 
         vbo = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo)
+        gl_state.bind_array_buffer(vbo)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STATIC_DRAW)  # noqa
-        gl.glVertexAttribPointer(attribute_index, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)  # noqa
+        VertexFormat(VEC2, attribute_index).setup()
 
         return vbo
 
     def _setup_uvb(self, attribute_index):
-        uv_coordinates = rect_triangles(0, 0, 1, 1)
+        uv_coordinates = rects_quads(self._texture.uv_rect)
 
         uvb = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, uvb)
+        gl_state.bind_array_buffer(uvb)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, uv_coordinates.nbytes, uv_coordinates, gl.GL_STATIC_READ)  # noqa
-        gl.glVertexAttribPointer(attribute_index, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)  # noqa
+        VertexFormat(VEC2, attribute_index).setup()
 
         return uvb
 
-    def draw(self, x=0, y=0, scale=1.0, flip_x=False, flip_y=False):
+    def draw(
+            self, x=0, y=0, scale=1.0, flip_x=False, flip_y=False, camera=None
+    ):
+        frame_uniforms.use(camera)
+
         with self._shader as active:
-            active['scale'] = scale
-            active['model_view_projection'] = ortho(
-                window.width,
-                window.height,
-                x, y,
-                flip_x, flip_y
-            )
+            self._draw(active, x, y, scale, flip_x, flip_y)
 
-            gl.glBindVertexArray(self.VAO)
+    def _draw(self, active, x, y, scale, flip_x, flip_y):
+        """ Draw with already bound shader so subclasses can set their own
+        uniforms without binding it again
+        """
+        active['translation'] = x, y
+        active['scale'] = (
+            -scale if flip_x else scale,
+            -scale if flip_y else scale,
+        )
 
-            gl.glActiveTexture(gl.GL_TEXTURE0)
-            gl.glBindTexture(gl.GL_TEXTURE_2D, self._texture.texture)
-            # note: use texture numbers
-            active['texture_sampler'] = 0
+        gl_state.bind_vertex_array(self.VAO)
+        gl_state.bind_texture(self._texture.texture, unit=0)
+        # note: use texture numbers
+        active['texture_sampler'] = 0
 
-            # note: sprite polygon has always 6 vertices
-            gl.glDrawArrays(gl.GL_TRIANGLES, 0, 6)
+        # note: sprite polygon is always single quad
+        quad_index_buffer.draw(1)
+
+    def delete(self):
+        """ Release GL objects, shader program and cached texture of sprite
+        """
+        gl.glDeleteBuffers(2, [self.VBO, self.UVB])
+        gl_state.deleted_array_buffer(self.VBO)
+        gl_state.deleted_array_buffer(self.UVB)
+        gl.glDeleteVertexArrays(1, [self.VAO])
+        gl_state.deleted_vertex_array(self.VAO)
+
+        programs.release(self._shader)
+
+        if self._owns_texture:
+            textures.release(self._texture)
 
     @property
     def texture_id(self):
@@ -176,44 +183,144 @@ class Sprite(object):
     def height(self):
         return self._texture.height
 
+    @property
+    def size(self):
+        """ Size of drawn quad in pixels """
+        return self.width, self.height
 
-class StaticAnimationAtlas(Texture):
-    def __init__(self, filename, mode="RGBA", subsheets=None):
-        self.subsheets = subsheets
-        super(StaticAnimationAtlas, self).__init__(filename, mode)
+    def uv_rect(self, frame=0, subsheet=None):
+        """ Return (u, v, width, height) of sprite image in its texture """
+        return self._texture.uv_rect
 
-    def _frame_from_subsheet(self, frame_index, subsheet_name):
-        if self.subsheets is None or subsheet_name is None:
-            return frame_index
+    def uv_rects(self, frames, subsheet=None):
+        """ Vectorized :meth:`uv_rect`, return (N, 4) array for N frames """
+        return np.broadcast_to(self.uv_rect(), (len(frames), 4))
+
+
+class AnimationFrames(object):
+    """ Frame lookup for images that are grids of equally sized frames
+
+    Works in image's own pixel space and maps results to texture UV space
+    with ``uv_rect`` so the same frame math is used by whole textures and
+    by sub-textures of atlases. Requires ``width``, ``height``, ``uv_rect``
+    and ``subsheets`` attributes.
+    """
+
+    def frame_table(self, width, height, subsheet=None):
+        """ Return read-only (frames, 2) array of UV offsets of all frames
+
+        Table is computed once for every frame size and subsheet and then
+        frame lookup is just indexing (see :meth:`frame_offsets`). Frames
+        of subsheet are its rows of the whole table.
+
+        :param width: frame width in pixels
+        :param height: frame height in pixels
+        :param subsheet: name of subsheet or None for all frames
+        """
+        return self._frames(width, height, subsheet)[0]
+
+    def _frames(self, width, height, subsheet=None):
+        """ Return frame table and the same offsets as list of tuples
+
+        note: scalar lookups index the list because indexing numpy array
+              and converting the result is slower than whole frame math
+        """
+        if self.subsheets is None:
+            subsheet = None
+
+        key = width, height, subsheet
+
+        try:
+            return self._frame_tables[key]
+        except AttributeError:
+            self._frame_tables = {}
+        except KeyError:
+            pass
+
+        if subsheet is None:
+            columns = int(self.width / width)
+            rows = int(self.height / height)
+
+            if not columns or not rows:
+                raise ValueError(
+                    "Frame {}x{} does not fit {}x{} image".format(
+                        width, height, self.width, self.height
+                    )
+                )
+
+            index = np.arange(columns * rows)
+            offsets = np.empty((len(index), 2))
+            # note: assume left-to-right top-to-bottom ordering of frames
+            # note: image starts in top-left corner
+            offsets[:, 0] = index % columns * width
+            offsets[:, 1] = self.height - (index // columns + 1) * height
+
+            u, v, uv_width, uv_height = self.uv_rect
+            table = offsets * (
+                float(uv_width) / self.width, float(uv_height) / self.height
+            ) + (u, v)
 
         else:
-            subsheet = self.subsheets[subsheet_name]
-            return subsheet[0] + (
-                int(frame_index) % (subsheet[1] - subsheet[0] + 1)
-            )
+            first, last = self.subsheets[subsheet]
+            whole = self.frame_table(width, height)
+            table = whole[np.arange(first, last + 1) % len(whole)]
+
+        table.flags.writeable = False
+        frames = self._frame_tables[key] = (
+            table, [tuple(offset) for offset in table.tolist()]
+        )
+
+        return frames
+
+    def frame_range(self, width, height, subsheet=None):
+        """ Return (first frame, frame count) of subsheet or of all frames
+        """
+        if self.subsheets is None or subsheet is None:
+            return 0, len(self.frame_table(width, height))
+
+        first, last = self.subsheets[subsheet]
+        return first, last - first + 1
+
+    def precompute_frames(self, width, height):
+        """ Build frame tables of given frame size for all subsheets """
+        self.frame_table(width, height)
+
+        for subsheet in self.subsheets or ():
+            self.frame_table(width, height, subsheet)
+
+    def frame_offsets(self, frame_indices, width, height, subsheet=None):
+        """ Vectorized :meth:`get_frame_offset`
+
+        :param frame_indices: (N,) array of frames (can be floats like
+            ``time() * fps``, they are truncated)
+        :return: (N, 2) array of UV offsets
+        """
+        table = self.frame_table(width, height, subsheet)
+        frame_indices = np.asarray(frame_indices).astype(np.int64)
+
+        return table[frame_indices % len(table)]
 
     def get_frame_offset(self, frame_index, width, height, subsheet=None):
         # note: cap frames for frame index overflow so user can issue
         #       `draw(frame=time())` in animated sprites
-        frame_index = self._frame_from_subsheet(frame_index, subsheet)
-        maxframes = int(self.width / width) * int(self.height / width)
-
-        div, mod = divmod(width * (int(frame_index) % maxframes), self.width)
-        # note: assume left-to-right top-to-bottom ordering of frames
-        # note: image starts in top-left corner
-        pixel_y_offset = self.height - (div + 1) * height
-        pixel_x_offset = mod
-
-        return (
-            float(pixel_x_offset) / self.width,
-            float(pixel_y_offset) / self.height,
-        )
+        offsets = self._frames(width, height, subsheet)[1]
+        return offsets[int(frame_index) % len(offsets)]
 
     def get_uv_data(self, width, height):
-        return rect_triangles(
+        """ Return UV coordinates of single frame quad (see rects_quads) """
+        _, __, uv_width, uv_height = self.uv_rect
+
+        return rects_quads([
             0, 0,
-            float(width) / self.width, float(height) / self.height
-        )
+            float(width) / self.width * uv_width,
+            float(height) / self.height * uv_height,
+        ])
+
+
+class StaticAnimationAtlas(AnimationFrames, Texture):
+    def __init__(self, filename, mode="RGBA", subsheets=None, **kwargs):
+        self.subsheets = subsheets
+        super(StaticAnimationAtlas, self).__init__(filename, mode, **kwargs)
 
 
 class AnimatedSprite(Sprite):
@@ -244,31 +351,68 @@ class AnimatedSprite(Sprite):
             texture=None,
             pivot=(0, 0),
             subsheets=None,
+            asynchronous=False,
     ):
         self.frame_size = frame_size
         self.subsheets = subsheets
-        super(AnimatedSprite, self).__init__(file_name, texture, pivot)
+        super(AnimatedSprite, self).__init__(
+            file_name, texture, pivot, asynchronous
+        )
+        # note: frame lookups on draw are plain table indexing
+        self._texture.precompute_frames(*frame_size)
 
     def _setup_texture(self, file_name):
-        return self.TEXTURE_CLASS(file_name, subsheets=self.subsheets)
+        return textures.acquire(
+            file_name,
+            texture_class=self.TEXTURE_CLASS,
+            asynchronous=self.asynchronous,
+            subsheets=self.subsheets,
+        )
+
+    @property
+    def size(self):
+        return tuple(self.frame_size)
+
+    @property
+    def _frame_uv_size(self):
+        _, __, uv_width, uv_height = self._texture.uv_rect
+
+        return (
+            float(self.frame_size[0]) / self._texture.width * uv_width,
+            float(self.frame_size[1]) / self._texture.height * uv_height,
+        )
+
+    def uv_rect(self, frame=0, subsheet=None):
+        return self._texture.get_frame_offset(
+            frame, *self.frame_size, subsheet=subsheet
+        ) + self._frame_uv_size
+
+    def uv_rects(self, frames, subsheet=None):
+        rects = np.empty((len(frames), 4))
+        rects[:, :2] = self._texture.frame_offsets(
+            frames, *self.frame_size, subsheet=subsheet
+        )
+        rects[:, 2:] = self._frame_uv_size
+
+        return rects
 
     def _setup_vbo(self, attribute_index):
-        vertices = rect_triangles(
-            0, 0, *self.frame_size
-        ) - np.array(self.pivot, dtype=np.float32)
+        vertices = rects_quads([0, 0, *self.frame_size], self.pivot)
 
         vbo = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo)
+        gl_state.bind_array_buffer(vbo)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STATIC_DRAW)  # noqa
-        gl.glVertexAttribPointer(attribute_index, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)  # noqa
+        VertexFormat(VEC2, attribute_index).setup()
+
+        return vbo
 
     def _setup_uvb(self, attribute_index):
         uvb = gl.glGenBuffers(1)
 
         uv_coordinates = self._texture.get_uv_data(*self.frame_size)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, uvb)
+        gl_state.bind_array_buffer(uvb)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, uv_coordinates.nbytes, uv_coordinates, gl.GL_STATIC_READ)  # noqa
-        gl.glVertexAttribPointer(attribute_index, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None)  # noqa
+        VertexFormat(VEC2, attribute_index).setup()
         return uvb
 
     def draw(
@@ -276,11 +420,442 @@ class AnimatedSprite(Sprite):
             x=0, y=0,
             scale=1.0,
             frame=0, subsheet=None,
-            flip_x=False, flip_y=False
+            flip_x=False, flip_y=False,
+            camera=None,
     ):
+        frame_uniforms.use(camera)
+
         with self._shader as active:
             active['offset'] = self._texture.get_frame_offset(
                 frame, *self.frame_size, subsheet=subsheet
             )  # noqa
+            self._draw(active, x, y, scale, flip_x, flip_y)
+
+
+class SpriteBatch(InstancedQuadBatch):
+    """ Draws many sprites with one instanced draw call per texture
+
+    Sprites are submitted every frame with :meth:`add` (same arguments as
+    :meth:`Sprite.draw` and :meth:`AnimatedSprite.draw`) and drawn on
+    :meth:`draw` which also empties the batch. Every submission is single
+    instance of shared unit quad described by its translation, scale, quad
+    rectangle and UV rectangle, so frames of animated sprites are just
+    different UV offsets of the same instance data.
+
+    By default submissions are grouped by texture and every group is drawn
+    with single ``glDrawElementsInstanced`` call. This changes drawing order
+    of sprites with different textures so use ``ordered=True`` if they
+    overlap. Then only consecutive submissions sharing texture are merged.
+    """
+    vertex_code = """
+        #version 330 core
+        """ + FRAME_BLOCK + """
+        // unit quad shared by all instances
+        layout(location = 0) in vec2 corner;
+
+        // per-instance attributes
+        layout(location = 1) in vec2 translation;
+        // note: scale is negative on flipped axes
+        layout(location = 2) in vec2 scale;
+        // quad relative to pivot (xy) and its size (zw)
+        layout(location = 3) in vec4 rect;
+        // UV offset (xy) and size (zw) of sprite image
+        layout(location = 4) in vec4 uv_rect;
+
+        out vec2 UV;
+
+        void main(){
+            gl_Position = projection * vec4(
+                (rect.xy + corner * rect.zw) * scale + translation, 0, 1
+            );
+            UV = uv_rect.xy + corner * uv_rect.zw;
+        }
+    """
+    fragment_code = Sprite.fragment_code
+
+    INSTANCE_DTYPE = np.dtype([
+        ('translation', np.float32, 2),
+        ('scale', np.float32, 2),
+        ('rect', np.float32, 4),
+        ('uv_rect', np.float32, 4),
+    ])
+    _PER_RECORD = ('_arena', '_textures')
+
+    def __init__(self, capacity=256, ordered=False):
+        """
+        :param capacity: initial number of submissions to allocate for
+        :param ordered: keep drawing order of submissions with different
+            textures at the cost of more draw calls
+        """
+        self.ordered = ordered
+        super(SpriteBatch, self).__init__(capacity)
+
+    def _allocate(self, capacity):
+        self._arena = np.zeros(capacity, dtype=self.INSTANCE_DTYPE)
+        # note: plain float view of the arena, it is much faster to write
+        #       than structured fields
+        self._floats = self._arena.view(np.float32).reshape(capacity, -1)
+        self._textures = np.zeros(capacity, dtype=np.int64)
+
+    def add(
+            self, sprite,
+            x=0, y=0,
+            scale=1.0,
+            flip_x=False, flip_y=False,
+            frame=0, subsheet=None,
+    ):
+        """ Submit sprite to be drawn on next :meth:`draw`
+
+        :param sprite: :class:`Sprite` or :class:`AnimatedSprite` instance
+        :param frame: animation frame (only for animated sprites)
+        :param subsheet: animation subsheet (only for animated sprites)
+        """
+        start, _ = self._extend(1)
+        width, height = sprite.size
+
+        self._floats[start] = (
+            x, y,
+            -scale if flip_x else scale,
+            -scale if flip_y else scale,
+            -sprite.pivot[0], -sprite.pivot[1], width, height,
+        ) + tuple(sprite.uv_rect(frame, subsheet))
+        self._textures[start] = sprite.texture_id
+
+    def add_many(
+            self, sprite,
+            positions,
+            scales=1.0,
+            flip_x=False, flip_y=False,
+            frames=0, subsheet=None,
+    ):
+        """ Vectorized :meth:`add` of many copies of the same sprite
+
+        :param positions: (N, 2) array of positions
+        :param scales: (N,) array of scales or single scale for all
+        :param flip_x: (N,) array of flags or single flag for all
+        :param flip_y: (N,) array of flags or single flag for all
+        :param frames: (N,) array of frames or single frame for all
+        """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        count = len(positions)
+        start, stop = self._extend(count)
+        instances = self._arena[start:stop]
+
+        scales = np.broadcast_to(
+            np.asarray(scales, dtype=np.float32), (count,)
+        )
+        width, height = sprite.size
+
+        instances['translation'] = positions
+        instances['scale'][:, 0] = np.where(flip_x, -scales, scales)
+        instances['scale'][:, 1] = np.where(flip_y, -scales, scales)
+        instances['rect'] = -sprite.pivot[0], -sprite.pivot[1], width, height
+
+        if np.ndim(frames):
+            instances['uv_rect'] = sprite.uv_rects(frames, subsheet)
+        else:
+            instances['uv_rect'] = sprite.uv_rect(frames, subsheet)
+
+        self._textures[start:stop] = sprite.texture_id
+
+    def _groups(self):
+        """ Return (start, stop, texture) of submissions drawn together """
+        textures = self._textures[:self._count]
+
+        if not self.ordered:
+            order = np.argsort(textures, kind='stable')
+            self._arena[:self._count] = self._arena[order]
+            textures = textures[order]
+
+        starts = np.concatenate((
+            [0], np.flatnonzero(textures[1:] != textures[:-1]) + 1
+        ))
+        stops = np.append(starts[1:], self._count)
+
+        return zip(starts.tolist(), stops.tolist(), textures[starts].tolist())
+
+
+class AnimationBatch(InstancedQuadBatch):
+    """ Retained batch of animated copies of one sprite animated on GPU
+
+    Unlike :class:`SpriteBatch` instances are kept between frames and
+    uploaded only when they change. Every instance stores its animation
+    start time, fps and subsheet frame range and vertex shader selects its
+    current frame from frame time of :data:`gl2dl.uniforms.frame_uniforms`,
+    so drawing thousands of animated sprites takes no per-frame CPU work
+    besides the single time upload done by apps and one draw call.
+
+    Frames are selected the same way as with
+    :meth:`AnimationFrames.get_frame_offset` for frame
+    ``int((time - start) * fps)``.
+    """
+    vertex_code = """
+        #version 330 core
+        """ + FRAME_BLOCK + """
+        // unit quad shared by all instances
+        layout(location = 0) in vec2 corner;
+
+        // per-instance attributes
+        layout(location = 1) in vec2 translation;
+        // note: scale is negative on flipped axes
+        layout(location = 2) in vec2 scale;
+        // start time, fps, first frame and frame count of animation
+        layout(location = 3) in vec4 animation;
+
+        // quad relative to pivot (xy) and its size (zw)
+        uniform vec4 rect;
+        // UV of top-left corner of the image and UV size of single frame
+        uniform vec2 uv_top_left;
+        uniform vec2 frame_uv_size;
+        // frames per row and total number of frames in the image
+        uniform vec2 grid;
+
+        out vec2 UV;
+
+        void main(){
+            gl_Position = projection * vec4(
+                (rect.xy + corner * rect.zw) * scale + translation, 0, 1
+            );
+
+            // note: float mod keeps frames before start time non-negative
+            float frame = mod(
+                animation.z + mod(
+                    floor((time - animation.x) * animation.y), animation.w
+                ),
+                grid.y
+            );
+            // note: frames are ordered left-to-right top-to-bottom
+            float row = floor(frame / grid.x);
+            vec2 offset = uv_top_left + vec2(
+                (frame - row * grid.x) * frame_uv_size.x,
+                -(row + 1.) * frame_uv_size.y
+            );
+
+            UV = offset + corner * frame_uv_size;
+        }
+    """
+    fragment_code = Sprite.fragment_code
+
+    INSTANCE_DTYPE = np.dtype([
+        ('translation', np.float32, 2),
+        ('scale', np.float32, 2),
+        ('animation', np.float32, 4),
+    ])
+    RETAINED = True
+
+    def __init__(self, sprite, capacity=256):
+        """
+        :param sprite: :class:`AnimatedSprite` which texture, frame size
+            and pivot are used by all instances
+        :param capacity: initial number of instances to allocate for
+        """
+        self.sprite = sprite
+        super(AnimationBatch, self).__init__(capacity)
+
+    @property
+    def instances(self):
+        """ Structured array of instances that can be edited in place
+
+        Call :meth:`changed` after editing so instances are uploaded again.
+        """
+        return self._arena[:self._count]
+
+    def add(
+            self,
+            x=0, y=0,
+            scale=1.0,
+            flip_x=False, flip_y=False,
+            fps=10., subsheet=None, start=None,
+    ):
+        """ Add animated instance and return its index
+
+        :param fps: animation speed in frames per second
+        :param subsheet: animation subsheet of the sprite
+        :param start: time of the first frame, current frame time
+            (see :attr:`gl2dl.uniforms.FrameUniforms.time`) by default
+        """
+        return self.add_many(
+            [[x, y]], scale, flip_x, flip_y, fps, subsheet, start
+        ).start
+
+    def add_many(
+            self,
+            positions,
+            scales=1.0,
+            flip_x=False, flip_y=False,
+            fps=10., subsheet=None, starts=None,
+    ):
+        """ Vectorized :meth:`add`
+
+        :param positions: (N, 2) array of positions
+        :param scales: (N,) array of scales or single scale for all
+        :param flip_x: (N,) array of flags or single flag for all
+        :param flip_y: (N,) array of flags or single flag for all
+        :param fps: (N,) array of fps or single fps for all
+        :param starts: (N,) array of start times or single time for all
+        :return: slice of added instances in :attr:`instances`
+        """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        count = len(positions)
+        start, stop = self._extend(count)
+        instances = self._arena[start:stop]
+
+        scales = np.broadcast_to(
+            np.asarray(scales, dtype=np.float32), (count,)
+        )
+        first, frames = self.sprite._texture.frame_range(
+            *self.sprite.frame_size, subsheet=subsheet
+        )
+
+        instances['translation'] = positions
+        instances['scale'][:, 0] = np.where(flip_x, -scales, scales)
+        instances['scale'][:, 1] = np.where(flip_y, -scales, scales)
+        instances['animation'][:, 0] = (
+            frame_uniforms.time if starts is None else starts
+        )
+        instances['animation'][:, 1] = fps
+        instances['animation'][:, 2:] = first, frames
+
+        return slice(start, stop)
+
+    def _set_uniforms(self, active):
+        texture = self.sprite._texture
+        width, height = self.sprite.frame_size
+        u, v, uv_width, uv_height = texture.uv_rect
+
+        active['rect'] = (
+            -self.sprite.pivot[0], -self.sprite.pivot[1], width, height
+        )
+        active['uv_top_left'] = u, v + uv_height
+        active['frame_uv_size'] = (
+            float(width) / texture.width * uv_width,
+            float(height) / texture.height * uv_height,
+        )
+        active['grid'] = (
+            int(texture.width / width),
+            len(texture.frame_table(width, height)),
+        )
+
+    def _groups(self):
+        return [(0, self._count, self.sprite.texture_id)]
+
+
+class TextureArrayBatch(InstancedQuadBatch):
+    """ Draws layers of :class:`gl2dl.textures.TextureArray` in one call
+
+    Works like :class:`SpriteBatch` (submissions are drawn and dropped on
+    :meth:`draw`) but every submission is addressed by layer index of the
+    texture array, so sprites with different images and animation frames
+    are all drawn with single instanced draw call without UV math.
+    """
+    vertex_code = """
+        #version 330 core
+        """ + FRAME_BLOCK + """
+        // unit quad shared by all instances
+        layout(location = 0) in vec2 corner;
+
+        // per-instance attributes
+        layout(location = 1) in vec2 translation;
+        // note: scale is negative on flipped axes
+        layout(location = 2) in vec2 scale;
+        layout(location = 3) in float layer;
+
+        // quad relative to pivot (xy) and its size (zw)
+        uniform vec4 rect;
+
+        out vec3 UV;
+
+        void main(){
+            gl_Position = projection * vec4(
+                (rect.xy + corner * rect.zw) * scale + translation, 0, 1
+            );
+            UV = vec3(corner, layer);
+        }
+    """
+    fragment_code = """
+        #version 330 core
+
+        in vec3 UV;
+
+        out vec4 color;
+
+        uniform sampler2DArray texture_sampler;
+
+        void main(){
+            color = texture(texture_sampler, UV).rgba;
+        }
+    """
+
+    INSTANCE_DTYPE = np.dtype([
+        ('translation', np.float32, 2),
+        ('scale', np.float32, 2),
+        ('layer', np.float32),
+    ])
+    TEXTURE_TARGET = TextureArray.TARGET
+
+    def __init__(self, texture, pivot=(0, 0), capacity=256):
+        """
+        :param texture: :class:`gl2dl.textures.TextureArray` instance
+        :param pivot: pivot (x, y) of all layers for scaling
+        :param capacity: initial number of submissions to allocate for
+        """
+        self.texture = texture
+        self.pivot = pivot
+        super(TextureArrayBatch, self).__init__(capacity)
+
+    def add(
+            self, layer,
+            x=0, y=0,
+            scale=1.0,
+            flip_x=False, flip_y=False,
+    ):
+        """ Submit layer to be drawn on next :meth:`draw`
+
+        :param layer: layer index, use
+            :meth:`gl2dl.textures.TextureArray.frame_layers` for frames of
+            animation subsheets
+        """
+        start, _ = self._extend(1)
+
+        self._arena[start] = (
+            (x, y),
+            (-scale if flip_x else scale, -scale if flip_y else scale),
+            layer,
+        )
+
+    def add_many(
+            self, layers,
+            positions,
+            scales=1.0,
+            flip_x=False, flip_y=False,
+    ):
+        """ Vectorized :meth:`add`
+
+        :param layers: (N,) array of layers or single layer for all
+        :param positions: (N, 2) array of positions
+        :param scales: (N,) array of scales or single scale for all
+        :param flip_x: (N,) array of flags or single flag for all
+        :param flip_y: (N,) array of flags or single flag for all
+        """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        count = len(positions)
+        start, stop = self._extend(count)
+        instances = self._arena[start:stop]
+
+        scales = np.broadcast_to(
+            np.asarray(scales, dtype=np.float32), (count,)
+        )
+
+        instances['translation'] = positions
+        instances['scale'][:, 0] = np.where(flip_x, -scales, scales)
+        instances['scale'][:, 1] = np.where(flip_y, -scales, scales)
+        instances['layer'] = layers
+
+    def _set_uniforms(self, active):
+        active['rect'] = (
+            -self.pivot[0], -self.pivot[1],
+            self.texture.width, self.texture.height,
+        )
 
-        super(AnimatedSprite, self).draw(x, y, scale, flip_x, flip_y)
+    def _groups(self):
+        return [(0, self._count, self.texture.texture)]
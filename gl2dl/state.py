@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import OpenGL.GL as gl
+
+
+class GLState(object):
+    """ CPU-side cache of GL context state that elides redundant changes.
+
+    All gl2dl modules route binds and other state changes through single
+    module level instance (:data:`gl_state`) so only real transitions reach
+    the driver. Cache knows nothing about changes made behind its back so
+    any code that changes the same state with raw GL calls (e.g. third party
+    renderers) must be followed by :meth:`invalidate`.
+
+    :attr:`issued` and :attr:`elided` count state changes that did and did
+    not reach the driver.
+    """
+
+    def __init__(self):
+        self._current = {}
+
+        self.issued = 0
+        self.elided = 0
+
+    def invalidate(self):
+        """ Forget everything so every following change reaches the driver
+        """
+        self._current.clear()
+
+    def reset_counters(self):
+        self.issued = 0
+        self.elided = 0
+
+    def _change(self, key, value):
+        """ Return True if state under ``key`` has to be changed to ``value``
+        """
+        if self._current.get(key) == value:
+            self.elided += 1
+            return False
+
+        self._current[key] = value
+        self.issued += 1
+        return True
+
+    def _forget(self, key, value):
+        if self._current.get(key) == value:
+            del self._current[key]
+
+    def use_program(self, program):
+        if self._change('program', program):
+            gl.glUseProgram(program)
+
+    def deleted_program(self, program):
+        self._forget('program', program)
+
+    @property
+    def program(self):
+        return self._current.get('program')
+
+    def bind_vertex_array(self, vertex_array):
+        if self._change('vertex_array', vertex_array):
+            gl.glBindVertexArray(vertex_array)
+
+    def deleted_vertex_array(self, vertex_array):
+        self._forget('vertex_array', vertex_array)
+
+    def bind_array_buffer(self, buffer):
+        if self._change('array_buffer', buffer):
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+
+    def deleted_array_buffer(self, buffer):
+        self._forget('array_buffer', buffer)
+
+    def active_texture(self, unit):
+        if self._change('active_texture', unit):
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+
+    def bind_texture(self, texture, unit=0, target=gl.GL_TEXTURE_2D):
+        key = ('texture', unit, target)
+
+        if self._current.get(key) == texture:
+            self.elided += 1
+            return
+
+        self.active_texture(unit)
+
+        if self._change(key, texture):
+            gl.glBindTexture(target, texture)
+
+    def deleted_texture(self, texture):
+        for key, value in list(self._current.items()):
+            if key[0] == 'texture' and value == texture:
+                del self._current[key]
+
+    def bind_framebuffer(self, framebuffer):
+        if self._change('framebuffer', framebuffer):
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, framebuffer)
+
+    @property
+    def framebuffer(self):
+        return self._current.get('framebuffer', 0)
+
+    @property
+    def current_framebuffer(self):
+        """ Framebuffer bound through the cache or None if not known """
+        return self._current.get('framebuffer')
+
+    @property
+    def current_viewport(self):
+        """ (x, y, width, height) of last viewport set through the cache """
+        return self._current.get('viewport')
+
+    def viewport(self, x, y, width, height):
+        if self._change('viewport', (x, y, width, height)):
+            gl.glViewport(x, y, width, height)
+
+    def enable_blend(self, enabled):
+        if self._change('blend', bool(enabled)):
+            if enabled:
+                gl.glEnable(gl.GL_BLEND)
+            else:
+                gl.glDisable(gl.GL_BLEND)
+
+    def blend_func(self, rgb_source, rgb_destination,
+                   alpha_source, alpha_destination):
+        if self._change('blend_func', (
+            rgb_source, rgb_destination, alpha_source, alpha_destination
+        )):
+            gl.glBlendFuncSeparate(
+                rgb_source, rgb_destination, alpha_source, alpha_destination
+            )
+
+    def blend_equation(self, rgb_mode, alpha_mode):
+        if self._change('blend_equation', (rgb_mode, alpha_mode)):
+            gl.glBlendEquationSeparate(rgb_mode, alpha_mode)
+
+
+gl_state = GLState()
@@ -0,0 +1,677 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import os
+import time
+
+import OpenGL.GL as gl
+import numpy as np
+from PIL import Image
+
+from .buffers import PixelBufferPool
+from .state import gl_state
+
+
+# note: pixel format of uploads in given PIL mode
+FORMATS = {
+    "RGBA": gl.GL_RGBA,
+    "RGB": gl.GL_RGB,
+}
+# note: pixel type of uploads from numpy arrays of given dtype
+TYPES = {
+    np.dtype(np.uint8): gl.GL_UNSIGNED_BYTE,
+    np.dtype(np.float32): gl.GL_FLOAT,
+}
+
+
+def _upload_pixels(pixels, mode):
+    """ Return numpy pixels validated and flipped to upload layout """
+    pixels = np.asarray(pixels)
+
+    if pixels.ndim != 3 or pixels.shape[2] != len(mode):
+        raise ValueError(
+            "Expected (height, width, {}) array of {} pixels, "
+            "got shape {}".format(len(mode), mode, pixels.shape)
+        )
+
+    if pixels.dtype not in TYPES:
+        raise ValueError(
+            "Unsupported pixel dtype {}, use uint8 or float32".format(
+                pixels.dtype
+            )
+        )
+
+    # note: textures are uploaded bottom-up
+    return np.ascontiguousarray(pixels[::-1])
+
+
+class Texture(object):
+    # note: (u, v, width, height) of the image in texture, whole texture here
+    #       but not in sub-textures of atlases (see gl2dl.atlas)
+    uv_rect = (0., 0., 1., 1.)
+
+    # note: single transparent texel uploaded in place of pixels that are
+    #       not loaded yet
+    PLACEHOLDER = b'\x00\x00\x00\x00'
+
+    FORMATS = FORMATS
+    TYPES = TYPES
+
+    def __init__(
+            self, file_name, mode="RGBA", keep_image=False, deferred=False
+    ):
+        """
+        :param file_name: image file name, already loaded PIL image or
+            (height, width, bands) numpy array of uint8 or float32 (0-1)
+            pixels with top row first
+        :param mode: PIL mode of uploaded pixels
+        :param keep_image: keep PIL image in memory after upload. By default
+            only dimensions and mode are kept and :attr:`image` re-reads
+            the file (or texture) when pixels are needed on CPU side
+        :param deferred: only read image header and upload transparent
+            placeholder. Pixels have to be provided later with
+            :meth:`finish` (see :class:`TextureLoader`)
+        """
+        # todo: consider refactoring because it maybe can be moved somwhere
+        # todo: else
+        if isinstance(file_name, np.ndarray):
+            self.file_name = None
+            image = None
+        elif isinstance(file_name, Image.Image):
+            self.file_name = getattr(file_name, 'filename', None) or None
+            image = file_name
+        else:
+            self.file_name = file_name
+            # note: image is decoded lazily, this reads only header
+            image = Image.open(file_name)
+
+        self.mode = mode
+        self.format = self.FORMATS[mode]
+
+        if image is None:
+            self.height, self.width = file_name.shape[:2]
+        else:
+            self.width, self.height = image.size
+        self._keep_image = keep_image
+        self._owns_image = image is not file_name
+        # note: decoding (worker) needs the image until pixels are uploaded
+        self._image = image
+        # note: pixels were changed with :meth:`update` so file is outdated
+        self._modified = False
+
+        # GL texture object initialization
+        # todo: consolidate contract, consider inheriting from int or GLuint
+        # todo: and maybe using __new__ to create new "ints" objects
+        # todo: see OpenGL.GL.shaders.ShaderProgram for reference
+        # todo: consider storing that as texture_id
+        self.texture = gl.glGenTextures(1)
+
+        if deferred:
+            self.ready = False
+            self._upload(1, 1, self.PLACEHOLDER, gl.GL_RGBA)
+        elif image is None:
+            pixels = self._pixels(file_name)
+            self._upload(
+                self.width, self.height, pixels,
+                self.format, self.TYPES[pixels.dtype],
+            )
+            self.ready = True
+        else:
+            self.finish(self.decode(image, mode))
+
+    @staticmethod
+    def decode(image, mode):
+        """ Return pixels of PIL image in upload layout
+
+        Does not touch GL so it can run on worker threads.
+        """
+        # note: different mode will require different argument in glTexImage2D
+        return image.convert(mode).tobytes("raw", mode, 0, -1)
+
+    def finish(self, pixels):
+        """ Upload decoded pixels (see :meth:`decode`) and drop the image """
+        self._upload(self.width, self.height, pixels, self.format)
+        self.ready = True
+
+        if self._keep_image:
+            return
+
+        if self._owns_image:
+            self._image.close()
+
+        self._image = None
+
+    def _upload(self, width, height, pixels, format, type=gl.GL_UNSIGNED_BYTE):  # noqa
+        gl_state.bind_texture(self.texture)
+        # note: rows of pixels are tightly packed (no 4 byte alignment)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        # pass image data as pixels
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, width, height, 0, format, type, pixels)  # noqa
+        gl.glTexParameter(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)  # noqa
+        gl.glTexParameter(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)  # noqa
+
+    def _pixels(self, pixels):
+        return _upload_pixels(pixels, self.mode)
+
+    def update(self, pixels, x=0, y=0, asynchronous=False):
+        """ Replace pixels of texture region without reallocating storage
+
+        Texture still waiting for :data:`loader` is finished first, since
+        its storage holds only the placeholder until then.
+
+        :param pixels: (height, width, bands) numpy array of uint8 or
+            float32 (0-1) pixels with top row first
+        :param x: left edge of the region in texture pixels
+        :param y: top edge of the region in texture pixels (from the top
+            like in images and arrays)
+        :param asynchronous: copy pixels through :data:`pixel_buffers` so
+            the call does not wait for transfer to the texture
+        """
+        if not self.ready:
+            loader.finish(self)
+
+        if not self.ready:
+            raise RuntimeError(
+                "Cannot update texture whose pixels were never loaded"
+            )
+
+        pixels = self._pixels(pixels)
+        height, width = pixels.shape[:2]
+
+        if (
+            x < 0 or y < 0 or
+            x + width > self.width or y + height > self.height
+        ):
+            raise ValueError(
+                "Region {}x{} at ({}, {}) is out of {}x{} texture".format(
+                    width, height, x, y, self.width, self.height
+                )
+            )
+
+        gl_state.bind_texture(self.texture)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+
+        args = (
+            gl.GL_TEXTURE_2D, 0, x, self.height - y - height, width, height,
+            self.format, self.TYPES[pixels.dtype],
+        )
+
+        if asynchronous:
+            pixel_buffers.write(pixels)
+            # note: pixels are read from bound pixel buffer at offset 0
+            gl.glTexSubImage2D(*args, ctypes.c_void_p(0))
+            pixel_buffers.fence()
+        else:
+            gl.glTexSubImage2D(*args, pixels)
+
+        # note: CPU-side image kept since upload is outdated now
+        if self._image is not None:
+            if self._owns_image:
+                self._image.close()
+            self._image = None
+
+        self._modified = True
+
+    @property
+    def image(self):
+        """ PIL image of the texture
+
+        Returns image kept since upload (see ``keep_image``), reads it again
+        from the file or reads pixels back from the texture if there is no
+        file or texture was updated since.
+        """
+        if self._image is not None:
+            return self._image
+
+        if self.file_name is not None and not self._modified:
+            image = Image.open(self.file_name)
+            image.load()
+            return image
+
+        gl_state.bind_texture(self.texture)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        pixels = gl.glGetTexImage(
+            gl.GL_TEXTURE_2D, 0, self.format, gl.GL_UNSIGNED_BYTE
+        )
+
+        return Image.frombytes(
+            self.mode, (self.width, self.height), pixels,
+            "raw", self.mode, 0, -1,
+        )
+
+    @property
+    def nbytes(self):
+        """ Approximate GPU memory used by texture (RGBA8 storage) """
+        return self.width * self.height * 4
+
+    def delete(self):
+        """ Release GL texture object """
+        gl.glDeleteTextures([self.texture])
+        gl_state.deleted_texture(self.texture)
+
+
+class TextureArray(object):
+    """ ``GL_TEXTURE_2D_ARRAY`` texture with equally sized images as layers
+
+    Sprites and animation frames stored as layers are addressed by layer
+    index instead of UV rectangle, so any of them can be drawn in the same
+    draw call (see :class:`gl2dl.sprites.TextureArrayBatch`) and sampling
+    never bleeds into neighbouring images like in atlases.
+    """
+    TARGET = gl.GL_TEXTURE_2D_ARRAY
+
+    def __init__(self, images, mode="RGBA", subsheets=None):
+        """
+        :param images: sequence of image file names, PIL images or
+            (height, width, bands) numpy arrays with top row first. All
+            images must have the same size.
+        :param mode: PIL mode of uploaded pixels
+        :param subsheets: dict of animation subsheets as (first, last)
+            layer ranges
+        """
+        layers = [self._decode(image, mode) for image in images]
+
+        if not layers:
+            raise ValueError("Texture array needs at least one image")
+
+        self.mode = mode
+        self.format = FORMATS[mode]
+        self.height, self.width = layers[0].shape[:2]
+        self.layers = len(layers)
+        self.subsheets = subsheets
+
+        for index, pixels in enumerate(layers):
+            if pixels.shape[:2] != (self.height, self.width):
+                raise ValueError(
+                    "Image {} is {}x{} but texture array layers are "
+                    "{}x{}".format(
+                        index, pixels.shape[1], pixels.shape[0],
+                        self.width, self.height,
+                    )
+                )
+
+        self.texture = gl.glGenTextures(1)
+        gl_state.bind_texture(self.texture, target=self.TARGET)
+        gl.glTexImage3D(self.TARGET, 0, gl.GL_RGBA, self.width, self.height, self.layers, 0, self.format, gl.GL_UNSIGNED_BYTE, None)  # noqa
+        gl.glTexParameter(self.TARGET, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)  # noqa
+        gl.glTexParameter(self.TARGET, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)  # noqa
+        gl.glTexParameter(self.TARGET, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)  # noqa
+        gl.glTexParameter(self.TARGET, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)  # noqa
+
+        for layer, pixels in enumerate(layers):
+            self.update(layer, pixels)
+
+    @staticmethod
+    def _decode(image, mode):
+        if isinstance(image, np.ndarray):
+            return image
+
+        if not isinstance(image, Image.Image):
+            with Image.open(image) as opened:
+                return np.asarray(opened.convert(mode))
+
+        return np.asarray(image.convert(mode))
+
+    @classmethod
+    def from_grid(cls, file_name, frame_size, mode="RGBA", subsheets=None):
+        """ Create texture array from image that is a grid of frames
+
+        Frames become layers in left-to-right top-to-bottom order so layer
+        indices are the same as frame indices of
+        :class:`gl2dl.sprites.StaticAnimationAtlas`.
+
+        :param file_name: image file name or PIL image
+        :param frame_size: (width, height) of single frame
+        """
+        pixels = cls._decode(file_name, mode)
+        width, height = frame_size
+        rows, columns = pixels.shape[0] // height, pixels.shape[1] // width
+
+        frames = pixels[:rows * height, :columns * width].reshape(
+            rows, height, columns, width, -1
+        ).swapaxes(1, 2).reshape(rows * columns, height, width, -1)
+
+        return cls(frames, mode, subsheets)
+
+    def update(self, layer, pixels, x=0, y=0):
+        """ Replace pixels of layer region without reallocating storage
+
+        :param layer: layer index
+        :param pixels: (height, width, bands) numpy array of uint8 or
+            float32 (0-1) pixels with top row first
+        :param x: left edge of the region in pixels
+        :param y: top edge of the region in pixels (from the top)
+        """
+        pixels = _upload_pixels(pixels, self.mode)
+        height, width = pixels.shape[:2]
+
+        if not 0 <= layer < self.layers or (
+            x < 0 or y < 0 or
+            x + width > self.width or y + height > self.height
+        ):
+            raise ValueError(
+                "Region {}x{} at ({}, {}) of layer {} is out of {}x{}x{} "
+                "texture array".format(
+                    width, height, x, y, layer,
+                    self.width, self.height, self.layers,
+                )
+            )
+
+        gl_state.bind_texture(self.texture, target=self.TARGET)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage3D(
+            self.TARGET, 0,
+            x, self.height - y - height, layer, width, height, 1,
+            self.format, TYPES[pixels.dtype], pixels,
+        )
+
+    def frame_layers(self, frame_indices, subsheet=None):
+        """ Return layers of animation frames (vectorized)
+
+        Frames wrap around subsheet (or all layers) so frames can be
+        computed from time like in :meth:`gl2dl.sprites.AnimatedSprite.draw`
+
+        :param frame_indices: frame index or (N,) array of frame indices
+        :param subsheet: name of animation subsheet
+        """
+        first, count = 0, self.layers
+
+        if self.subsheets is not None and subsheet is not None:
+            first, last = self.subsheets[subsheet]
+            count = last - first + 1
+
+        frame_indices = np.asarray(frame_indices).astype(np.int64)
+        return (first + frame_indices % count) % self.layers
+
+    def __len__(self):
+        return self.layers
+
+    @property
+    def nbytes(self):
+        """ Approximate GPU memory used by texture (RGBA8 storage) """
+        return self.width * self.height * self.layers * 4
+
+    def delete(self):
+        """ Release GL texture object """
+        gl.glDeleteTextures([self.texture])
+        gl_state.deleted_texture(self.texture)
+
+
+def _freeze(value):
+    """ Return hashable version of (nested) dicts and lists """
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (key, _freeze(item)) for key, item in value.items()
+        ))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+
+    return value
+
+
+class TextureLoader(object):
+    """ Asynchronous texture loading on a thread pool
+
+    :meth:`load` returns texture right away with its final dimensions and
+    transparent placeholder pixels, so sprites can be created with it
+    before image is decoded. Decoding and mode conversion run on worker
+    threads and decoded pixels are uploaded on the main thread (the one
+    with GL context) by :meth:`update` that apps call once per frame.
+
+    Uploads done by single :meth:`update` are limited by ``byte_budget``
+    and/or ``time_budget`` so streaming many textures in does not cause
+    frame hitches. At least one texture is uploaded on every update so
+    loading always progresses.
+    """
+
+    def __init__(self, workers=None, byte_budget=None, time_budget=None):
+        """
+        :param workers: number of decoding threads, up to 4 by default
+        :param byte_budget: maximum of bytes uploaded per :meth:`update`
+        :param time_budget: maximum of seconds spent in :meth:`update`
+        """
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.byte_budget = byte_budget
+        self.time_budget = time_budget
+
+        # note: executor is started on first load so importing the module
+        #       does not spawn threads
+        self._executor = None
+        # note: (texture, future) pairs in submission order
+        self._pending = []
+
+    def __len__(self):
+        """ Number of textures waiting for upload """
+        return len(self._pending)
+
+    def load(self, file_name, mode="RGBA", texture_class=Texture, **kwargs):
+        """ Return placeholder texture and decode its pixels in background
+
+        Must be called with current GL context.
+
+        :param file_name: image file name or PIL image
+        :param mode: PIL mode of uploaded pixels
+        :param texture_class: :class:`Texture` or its subclass
+        :param kwargs: extra arguments of texture class
+        """
+        texture = texture_class(file_name, mode, deferred=True, **kwargs)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers)
+
+        future = self._executor.submit(
+            texture.decode, texture._image, texture.mode
+        )
+        self._pending.append((texture, future))
+
+        return texture
+
+    def cancel(self, texture):
+        """ Stop waiting for pixels of texture (e.g. before it is deleted) """
+        for index, (pending, future) in enumerate(self._pending):
+            if pending is texture:
+                future.cancel()
+                del self._pending[index]
+                return
+
+    def update(self):
+        """ Upload textures decoded so far within per-frame budgets
+
+        Exceptions raised while decoding are re-raised here, texture that
+        failed keeps its placeholder pixels.
+
+        :return: number of uploaded textures
+        """
+        started = time.perf_counter()
+        uploaded = 0
+        uploaded_bytes = 0
+
+        for texture, future in list(self._pending):
+            if uploaded and (
+                (self.byte_budget is not None and
+                 uploaded_bytes >= self.byte_budget) or
+                (self.time_budget is not None and
+                 time.perf_counter() - started >= self.time_budget)
+            ):
+                break
+
+            if not future.done():
+                continue
+
+            self._pending.remove((texture, future))
+            texture.finish(future.result())
+
+            uploaded += 1
+            uploaded_bytes += texture.nbytes
+
+        return uploaded
+
+    def finish(self, texture=None):
+        """ Block until texture (or all pending textures) is uploaded
+
+        Ignores budgets, useful for loading screens and tests.
+        """
+        for pending, future in list(self._pending):
+            if texture is None or pending is texture:
+                self._pending.remove((pending, future))
+                pending.finish(future.result())
+
+    def shutdown(self):
+        """ Stop worker threads, pending textures keep placeholders """
+        for _, future in self._pending:
+            future.cancel()
+
+        self._pending = []
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class TextureCache(object):
+    """ Process-wide cache of shared, reference counted textures.
+
+    Textures are keyed by absolute file path, mode, file modification time,
+    texture class and its extra arguments so every image file is decoded
+    and uploaded once no matter how many sprites use it, and changed files
+    are loaded again.
+
+    Textures released by all their users are not deleted right away but
+    kept for reuse until GPU memory used by cached textures exceeds
+    :attr:`budget`. Then least recently used unreferenced textures are
+    evicted (deleted) until the cache fits the budget again. Textures that
+    are still referenced are never evicted.
+    """
+
+    def __init__(self, budget=256 * 1024 * 1024):
+        """
+        :param budget: GPU memory budget for cached textures in bytes
+        """
+        self.budget = budget
+
+        # note: key -> texture in order from least to most recently used
+        self._textures = OrderedDict()
+        self._keys = {}
+        self._references = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.gpu_bytes = 0
+
+    def _key(self, file_name, mode, texture_class, kwargs):
+        path = os.path.abspath(file_name)
+
+        return (
+            path, mode, os.stat(path).st_mtime_ns,
+            texture_class, _freeze(kwargs),
+        )
+
+    def acquire(
+            self, file_name, mode="RGBA", texture_class=Texture,
+            asynchronous=False, **kwargs
+    ):
+        """ Return shared texture of given file and increase its refcount
+
+        :param file_name: image file name
+        :param mode: PIL mode of uploaded pixels
+        :param texture_class: :class:`Texture` or its subclass
+        :param asynchronous: load texture with :data:`loader` and return it
+            with placeholder pixels. Otherwise texture still being loaded
+            asynchronously is finished right away
+        :param kwargs: extra arguments of texture class
+        """
+        key = self._key(file_name, mode, texture_class, kwargs)
+        texture = self._textures.get(key)
+
+        if texture is None:
+            self.misses += 1
+
+            if asynchronous:
+                texture = loader.load(
+                    file_name, mode, texture_class, **kwargs
+                )
+            else:
+                texture = texture_class(file_name, mode, **kwargs)
+
+            self._textures[key] = texture
+            self._keys[id(texture)] = key
+            self._references[key] = 0
+            self.gpu_bytes += texture.nbytes
+
+        else:
+            self.hits += 1
+            self._textures.move_to_end(key)
+
+            if not asynchronous and not texture.ready:
+                loader.finish(texture)
+
+        self._references[key] += 1
+        self._evict()
+
+        return texture
+
+    def release(self, texture):
+        """ Decrease refcount of texture
+
+        Unreferenced texture stays cached until it is evicted.
+        """
+        key = self._keys[id(texture)]
+        self._references[key] -= 1
+        self._evict()
+
+    def references(self, texture):
+        key = self._keys.get(id(texture))
+        return self._references[key] if key else 0
+
+    def _evict(self):
+        if self.gpu_bytes <= self.budget:
+            return
+
+        for key in list(self._textures):
+            if self.gpu_bytes <= self.budget:
+                break
+
+            if not self._references[key]:
+                self._remove(key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        texture = self._textures.pop(key)
+        del self._keys[id(texture)]
+        del self._references[key]
+
+        self.gpu_bytes -= texture.nbytes
+
+        if not texture.ready:
+            loader.cancel(texture)
+
+        texture.delete()
+
+    def clear(self):
+        """ Delete all unreferenced textures """
+        for key in list(self._textures):
+            if not self._references[key]:
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._textures)
+
+    def stats(self):
+        """ Return dict with cache statistics """
+        return {
+            'textures': len(self._textures),
+            'referenced': sum(1 for refs in self._references.values() if refs),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'gpu_bytes': self.gpu_bytes,
+            'budget': self.budget,
+        }
+
+
+pixel_buffers = PixelBufferPool()
+loader = TextureLoader()
+textures = TextureCache()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from time import perf_counter
+
+import OpenGL.GL as gl
+import numpy as np
+
+from .shaders import UNIFORM_BLOCK_BINDINGS
+
+# note: GLSL declaration of the block has to be kept in sync with
+#       FrameUniforms.DTYPE (std140 layout rules apply)
+FRAME_BLOCK = """
+    layout(std140) uniform Frame {
+        mat4 projection;
+        vec2 viewport;
+        float framebuffer_scale;
+        // seconds since start of the app (see FrameUniforms.time)
+        float time;
+    };
+"""
+
+
+class FrameUniforms(object):
+    """ Uniform buffer with per-frame data shared by all built-in shaders.
+
+    Holds view-projection matrix of the current camera, viewport size,
+    framebuffer scale and frame time. Buffer is uploaded only when any of
+    these changes (e.g. on window resize, camera move or new frame) so
+    drawables need to upload only their own per-object uniforms.
+    Applications update it once per frame and drawables switch cameras
+    with :meth:`use`.
+
+    Frame time is the clock of animations computed in shaders (see
+    :class:`gl2dl.sprites.AnimationBatch`).
+    """
+    BLOCK_NAME = 'Frame'
+    BINDING = UNIFORM_BLOCK_BINDINGS[BLOCK_NAME]
+
+    DTYPE = np.dtype([
+        ('projection', np.float32, (4, 4)),
+        ('viewport', np.float32, 2),
+        ('framebuffer_scale', np.float32),
+        ('time', np.float32),
+    ])
+
+    def __init__(self):
+        self._data = np.zeros((), dtype=self.DTYPE)
+        self._buffer = None
+        self._state = None
+
+        self.width = None
+        self.height = None
+        self.framebuffer_scale = 1.
+        # note: seconds since epoch, small enough for float32 in shaders
+        self.time = 0.
+        self.epoch = perf_counter()
+        # note: frame camera used by drawables that do not pass their own
+        self.camera = None
+
+        # note: matrix kept separately in row-major order for CPU-side use
+        self.projection = np.identity(4, dtype=np.float32)
+
+    def update(
+            self, width, height, framebuffer_scale=1., camera=None, time=None
+    ):
+        """ Update frame data and upload it if anything has changed
+
+        Must be called with current GL context.
+
+        :param width: window width
+        :param height: window height
+        :param framebuffer_scale: ratio of framebuffer to window size
+        :param camera: frame camera (see :class:`gl2dl.camera.Camera`).
+            If None then world coordinates are window pixels.
+        :param time: frame time in seconds. If None then time since
+            :attr:`epoch` is used.
+        """
+        self.width = width
+        self.height = height
+        self.framebuffer_scale = framebuffer_scale
+        self.camera = camera
+        self.time = perf_counter() - self.epoch if time is None else time
+
+        self.use(camera)
+
+    def use(self, camera=None):
+        """ Switch to given camera for following draws
+
+        Cheap enough to be called on every draw call because matrices are
+        cached in the camera and buffer is uploaded only on actual change.
+
+        :param camera: camera to use. If None then frame camera is used.
+        """
+        camera = camera or self.camera
+        state = (
+            self.width, self.height, self.framebuffer_scale, self.time,
+            camera, camera.version if camera else None,
+        )
+
+        if state == self._state:
+            return
+
+        self._state = state
+
+        if camera is None:
+            self.projection = np.array([
+                [2. / self.width, 0,                0,  -1],
+                [0,               2. / self.height, 0,  -1],
+                [0,               0,                -2, -1],
+                [0,               0,                0,  1.],
+            ], dtype=np.float32)
+        else:
+            self.projection = camera.view_projection(self.width, self.height)
+
+        # note: std140 matrices are column-major
+        self._data['projection'] = self.projection.T
+        self._data['viewport'] = self.width, self.height
+        self._data['framebuffer_scale'] = self.framebuffer_scale
+        self._data['time'] = self.time
+
+        self._upload()
+
+    def to_window(self, x, y):
+        """ Convert world position to window coordinates using current camera
+        """
+        ndc = self.projection.dot(np.array([x, y, 0, 1], dtype=np.float64))
+        return (ndc[0] + 1) * self.width / 2., (ndc[1] + 1) * self.height / 2.
+
+    @property
+    def window_scale(self):
+        """ Number of window pixels per world unit in current camera """
+        return float(self.projection[0, 0]) * self.width / 2.
+
+    def _upload(self):
+        if self._buffer is None:
+            self._buffer = gl.glGenBuffers(1)
+            gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self._buffer)
+            gl.glBufferData(
+                gl.GL_UNIFORM_BUFFER,
+                self._data.nbytes, self._data.tobytes(),
+                gl.GL_DYNAMIC_DRAW,
+            )
+            gl.glBindBufferBase(
+                gl.GL_UNIFORM_BUFFER, self.BINDING, self._buffer
+            )
+
+        else:
+            gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self._buffer)
+            gl.glBufferSubData(
+                gl.GL_UNIFORM_BUFFER,
+                0, self._data.nbytes, self._data.tobytes(),
+            )
+
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+
+
+frame_uniforms = FrameUniforms()
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+import ctypes
+from dataclasses import astuple, dataclass
+
+import OpenGL.GL as gl
+import numpy as np
+
+# note: single attribute dtypes usable directly as VertexFormat fields
+VEC1 = np.dtype(np.float32)
+VEC2 = np.dtype((np.float32, 2))
+VEC3 = np.dtype((np.float32, 3))
+VEC4 = np.dtype((np.float32, 4))
+
+
+class VertexFormat(object):
+    """ Vertex layout declared with numpy dtype that configures VAOs
+
+    Every field of structured dtype becomes one generic vertex attribute.
+    Fields get consecutive locations in order of declaration starting from
+    ``first_location`` and stride and offsets are taken from the dtype, so
+    vertex data built in arrays of :attr:`dtype` can be uploaded as it is.
+    Non-structured dtype (e.g. ``VEC2``) describes single attribute.
+
+    Example::
+
+        COLORED = VertexFormat([
+            ('position', np.float32, 2),
+            ('color', np.uint8, 4),
+        ], normalized=('color',))
+
+        vertices = COLORED.zeros(3)
+        vertices['position'] = (0, 0), (0, 100), (100, 0)
+        vertices['color'] = 255
+
+        # with VAO and array buffer bound
+        COLORED.setup()
+    """
+
+    GL_TYPES = {
+        np.dtype(np.float16): gl.GL_HALF_FLOAT,
+        np.dtype(np.float32): gl.GL_FLOAT,
+        np.dtype(np.float64): gl.GL_DOUBLE,
+        np.dtype(np.int8): gl.GL_BYTE,
+        np.dtype(np.uint8): gl.GL_UNSIGNED_BYTE,
+        np.dtype(np.int16): gl.GL_SHORT,
+        np.dtype(np.uint16): gl.GL_UNSIGNED_SHORT,
+        np.dtype(np.int32): gl.GL_INT,
+        np.dtype(np.uint32): gl.GL_UNSIGNED_INT,
+    }
+
+    def __init__(self, fields, first_location=0, divisor=0, normalized=()):
+        """
+        :param fields: numpy dtype or anything accepted by ``np.dtype()``
+        :param first_location: location of the first attribute
+        :param divisor: attribute divisor, 1 for per-instance attributes
+        :param normalized: names of integer fields that are normalized to
+            [0, 1] (or [-1, 1]) floats. Other integer fields are passed
+            to shaders as integers (``ivec``/``uvec``)
+        """
+        self.dtype = np.dtype(fields)
+        self.divisor = divisor
+        self.attributes = []
+
+        names = self.dtype.names or (None,)
+
+        for location, name in enumerate(names, first_location):
+            if name is None:
+                dtype, offset = self.dtype, 0
+            else:
+                dtype, offset = self.dtype.fields[name][:2]
+
+            base = dtype.base
+            size = int(np.prod(dtype.shape, dtype=int))
+
+            if base not in self.GL_TYPES or not 1 <= size <= 4:
+                raise ValueError(
+                    "Unsupported vertex attribute {!r} of type {}".format(
+                        name, dtype
+                    )
+                )
+
+            self.attributes.append((
+                location, size, self.GL_TYPES[base], offset,
+                # note: only integer fields can be normalized
+                name in normalized if base.kind in 'iu' else False,
+            ))
+
+    @property
+    def stride(self):
+        return self.dtype.itemsize
+
+    @property
+    def locations(self):
+        return [location for location, *_ in self.attributes]
+
+    def zeros(self, count):
+        """ Return zero-filled array of ``count`` vertices of this format """
+        return np.zeros(count, dtype=self.dtype)
+
+    def empty(self, count):
+        """ Return uninitialized array of ``count`` vertices of this format """
+        return np.empty(count, dtype=self.dtype)
+
+    def setup(self, offset=0):
+        """ Point attributes of this format at currently bound array buffer
+
+        Must be called with VAO and array buffer bound. Attribute pointers
+        are stored in the VAO so it is needed only once per VAO and buffer.
+
+        :param offset: byte offset of the first vertex in the buffer
+        """
+        for location, size, gl_type, field_offset, normalized in (
+            self.attributes
+        ):
+            pointer = ctypes.c_void_p(offset + field_offset)
+            gl.glEnableVertexAttribArray(location)
+
+            if gl_type in (gl.GL_FLOAT, gl.GL_HALF_FLOAT, gl.GL_DOUBLE) or (
+                normalized
+            ):
+                gl.glVertexAttribPointer(
+                    location, size, gl_type,
+                    gl.GL_TRUE if normalized else gl.GL_FALSE,
+                    self.stride, pointer
+                )
+            else:
+                gl.glVertexAttribIPointer(
+                    location, size, gl_type, self.stride, pointer
+                )
+
+            if self.divisor:
+                gl.glVertexAttribDivisor(location, self.divisor)
+
+
+# note: formats shared by built-in drawables
+POSITION = VertexFormat(VEC2)
+POSITION_COLOR = VertexFormat([
+    ('position', np.float32, 2),
+    ('color', np.float32, 4),
+])
+
+
+@dataclass
+class Vec1:
+    x: float
+
+
+@dataclass
+class Vec2:
+    x: float
+    y: float
+
+
+@dataclass
+class Vec3:
+    x: float
+    y: float
+    z: float
+
+
+@dataclass
+class Vec4:
+    x: float
+    y: float
+    z: float
+    w: float
+
+
+def _component(index):
+    def getter(self):
+        return self.data[:, index]
+
+    def setter(self, value):
+        self.data[:, index] = value
+
+    return property(getter, setter)
+
+
+class VecArray(object):
+    """ Compact growable array of float32 vectors
+
+    Array-backed replacement for lists of :class:`Vec2` (etc.) objects.
+    Vectors are kept in single contiguous ``(N, dimensions)`` array so they
+    can be modified with vectorized operations on components (``.x``,
+    ``.y``, ...) and uploaded to GL or assigned to fields of
+    :class:`VertexFormat` arrays without conversion (``np.asarray()``
+    returns :attr:`data` with no copy). Indexing with integer returns
+    dataclass copy of single vector, indexing with slice returns array of
+    vectors sharing memory with this one (same as numpy indexing rules).
+    """
+    DIMENSIONS = None
+    ITEM = None
+
+    def __init__(self, vectors=(), capacity=0):
+        """
+        :param vectors: array-like of shape (N, dimensions) or iterable of
+            vector dataclasses
+        :param capacity: initial number of vectors that can be stored
+            before storage has to grow
+        """
+        vectors = self._coerce(vectors)
+
+        self._storage = np.zeros(
+            (max(capacity, len(vectors)), self.DIMENSIONS), dtype=np.float32
+        )
+        self._storage[:len(vectors)] = vectors
+        self._count = len(vectors)
+
+    @classmethod
+    def _view(cls, data):
+        view = cls.__new__(cls)
+        view._storage = data
+        view._count = len(data)
+        return view
+
+    def _coerce(self, vectors):
+        if isinstance(vectors, VecArray):
+            return vectors.data
+
+        if not isinstance(vectors, np.ndarray):
+            vectors = [
+                astuple(vector) if isinstance(vector, self.ITEM) else vector
+                for vector in vectors
+            ]
+
+        return np.asarray(vectors, dtype=np.float32).reshape(
+            -1, self.DIMENSIONS
+        )
+
+    @property
+    def data(self):
+        """ Array of shape (N, dimensions) with stored vectors (no copy) """
+        return self._storage[:self._count]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self._storage.dtype:
+            return self.data
+
+        return self.data.astype(dtype)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for row in self.data:
+            yield self.ITEM(*row.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.ITEM(*self.data[index].tolist())
+
+        return self._view(self.data[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(value, self.ITEM):
+            value = astuple(value)
+        elif isinstance(value, VecArray) or (
+            isinstance(value, (list, tuple)) and value and
+            isinstance(value[0], self.ITEM)
+        ):
+            value = self._coerce(value)
+
+        self.data[index] = value
+
+    def reserve(self, capacity):
+        """ Make sure array can store ``capacity`` vectors without growing """
+        if capacity > len(self._storage):
+            storage = np.zeros(
+                (max(capacity, 2 * len(self._storage)), self.DIMENSIONS),
+                dtype=np.float32,
+            )
+            storage[:self._count] = self.data
+            self._storage = storage
+
+    def append(self, vector):
+        self.extend([vector])
+
+    def extend(self, vectors):
+        vectors = self._coerce(vectors)
+        count = self._count + len(vectors)
+
+        self.reserve(count)
+        self._storage[self._count:count] = vectors
+        self._count = count
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.data.tolist())
+
+
+class Vec1Array(VecArray):
+    DIMENSIONS = 1
+    ITEM = Vec1
+
+    x = _component(0)
+
+
+class Vec2Array(VecArray):
+    DIMENSIONS = 2
+    ITEM = Vec2
+
+    x = _component(0)
+    y = _component(1)
+
+
+class Vec3Array(VecArray):
+    DIMENSIONS = 3
+    ITEM = Vec3
+
+    x = _component(0)
+    y = _component(1)
+    z = _component(2)
+
+
+class Vec4Array(VecArray):
+    DIMENSIONS = 4
+    ITEM = Vec4
+
+    x = _component(0)
+    y = _component(1)
+    z = _component(2)
+    w = _component(3)
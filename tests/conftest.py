@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures of tests that need GL context.
+
+Context is created offscreen with EGL (e.g. Mesa surfaceless platform) so
+tests run without display. Tests using it are skipped when it is not
+available.
+"""
+import ctypes
+import os
+
+# note: has to be set before OpenGL is imported anywhere
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+
+import numpy as np  # noqa
+import OpenGL.GL as gl  # noqa
+import pytest  # noqa
+
+# note: surfaceless platform of Mesa, needs no window system at all
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+SIZE = 64
+
+
+def _make_context():
+    from OpenGL import EGL
+    from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+
+    display = eglGetPlatformDisplayEXT(
+        EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None
+    )
+    major, minor = EGL.EGLint(), EGL.EGLint()
+
+    if not display or not EGL.eglInitialize(
+        display, ctypes.pointer(major), ctypes.pointer(minor)
+    ):
+        raise RuntimeError("EGL display not available")
+
+    attributes = (EGL.EGLint * 5)(
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_NONE,
+    )
+    config = EGL.EGLConfig()
+    configs = EGL.EGLint()
+    EGL.eglChooseConfig(
+        display, attributes, ctypes.pointer(config), 1,
+        ctypes.pointer(configs),
+    )
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+
+    context = EGL.eglCreateContext(
+        display, config, EGL.EGL_NO_CONTEXT, (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        )
+    )
+
+    if not context or not EGL.eglMakeCurrent(
+        display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context
+    ):
+        raise RuntimeError("EGL context not available")
+
+
+@pytest.fixture(scope='session')
+def gl_context():
+    """ Current GL 3.3 core context without any window """
+    try:
+        _make_context()
+    except Exception as error:
+        pytest.skip("No offscreen GL context: {}".format(error))
+
+
+class _WindowContext(object):
+    width = SIZE
+    height = SIZE
+
+
+@pytest.fixture(scope='session')
+def framebuffer(gl_context):
+    """ SIZE x SIZE framebuffer standing in for window """
+    from gl2dl.app import window
+    from gl2dl.state import gl_state
+    from gl2dl.uniforms import frame_uniforms
+
+    if window._attached_context is None:
+        window.attach_context(_WindowContext())
+
+    texture = gl.glGenTextures(1)
+    gl_state.bind_texture(texture)
+    gl.glTexImage2D(
+        gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, SIZE, SIZE, 0,
+        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None,
+    )
+    framebuffer = gl.glGenFramebuffers(1)
+    gl_state.bind_framebuffer(framebuffer)
+    gl.glFramebufferTexture2D(
+        gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0,
+        gl.GL_TEXTURE_2D, texture, 0,
+    )
+    frame_uniforms.update(SIZE, SIZE)
+
+    return framebuffer
+
+
+@pytest.fixture
+def target(framebuffer):
+    """ Bind cleared framebuffer and return reader of its pixels
+
+    Reader returns (SIZE, SIZE, 4) uint8 array with the bottom row first.
+    """
+    from gl2dl.state import gl_state
+
+    gl_state.bind_framebuffer(framebuffer)
+    gl_state.viewport(0, 0, SIZE, SIZE)
+    gl.glClearColor(0, 0, 0, 0)
+    gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+    def pixels():
+        gl_state.bind_framebuffer(framebuffer)
+        data = gl.glReadPixels(
+            0, 0, SIZE, SIZE, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE
+        )
+        return np.frombuffer(data, dtype=np.uint8).reshape(SIZE, SIZE, 4)
+
+    return pixels
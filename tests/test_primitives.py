@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from gl2dl.primitives import Triangles
+
+from conftest import SIZE
+
+
+def test_triangles_draw_plain_float_array(target):
+    # note: two triangles covering left half of the target, x y r g b a
+    half = SIZE / 2
+    vertices = np.array([
+        (0, 0, 1, 0, 0, 1),
+        (half, 0, 1, 0, 0, 1),
+        (half, SIZE, 1, 0, 0, 1),
+        (0, 0, 1, 0, 0, 1),
+        (half, SIZE, 1, 0, 0, 1),
+        (0, SIZE, 1, 0, 0, 1),
+    ], dtype=np.float32)
+
+    triangles = Triangles(vertices)
+    triangles.draw()
+    pixels = target()
+    triangles.delete()
+
+    assert (pixels[:, :SIZE // 2 - 1] == (255, 0, 0, 255)).all()
+    assert (pixels[:, SIZE // 2 + 1:] == (0, 0, 0, 0)).all()
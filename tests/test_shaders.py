@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from gl2dl.shaders import ShaderCompilationError, ShaderProgram
+
+VERTEX = """
+    #version 330 core
+    void main() {
+        gl_Position = vec4(0.0, 0.0, 0.0, 1.0);
+    }
+"""
+
+BROKEN_FRAGMENT = """
+    #version 330 core
+    out vec4 color;
+    void main() {
+        color = undefined_value;
+    }
+"""
+
+
+def test_deferred_error_is_raised_on_every_bind(gl_context):
+    program = ShaderProgram(VERTEX, BROKEN_FRAGMENT, deferred=True)
+
+    with pytest.raises(ShaderCompilationError):
+        program.bind()
+
+    # note: second bind must not silently use the broken program
+    with pytest.raises(ShaderCompilationError):
+        program.bind()
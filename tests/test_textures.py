@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from PIL import Image
+
+from gl2dl.textures import Texture, loader
+
+
+def test_update_of_pending_texture_finishes_loading(gl_context, tmp_path):
+    file_name = str(tmp_path / "image.png")
+    Image.new("RGBA", (8, 4), (0, 0, 255, 255)).save(file_name)
+
+    texture = loader.load(file_name)
+    texture.update(np.full((2, 2, 4), 255, dtype=np.uint8), x=1, y=1)
+
+    pixels = np.asarray(texture.image)
+    texture.delete()
+
+    assert texture.ready
+    assert not len(loader)
+    # note: placeholder storage is 1x1 so region would be out of bounds
+    assert pixels.shape == (4, 8, 4)
+    assert (pixels[1:3, 1:3] == 255).all()
+    assert (pixels[0] == (0, 0, 255, 255)).all()
+    assert (pixels[3] == (0, 0, 255, 255)).all()
+
+
+def test_update_of_never_loaded_texture_raises(gl_context, tmp_path):
+    file_name = str(tmp_path / "image.png")
+    Image.new("RGBA", (8, 4)).save(file_name)
+
+    texture = Texture(file_name, deferred=True)
+
+    with pytest.raises(RuntimeError):
+        texture.update(np.zeros((2, 2, 4), dtype=np.uint8))
+
+    texture.delete()